@@ -1,25 +1,99 @@
 # Imports
+import contextlib
+import dataclasses
+import functools
+import html
+import importlib.util
+import itertools
+import json
+import logging
 import os
+import queue
+import re
 import threading
+import time
 import traceback
+import uuid
+from typing import TYPE_CHECKING, Callable, Dict, Optional
 
-import httpx
 import streamlit as st
-from deepgram import (
-    DeepgramClient,
-    FileSource,
-    LiveOptions,
-    LiveTranscriptionEvents,
-    PrerecordedOptions,
-)
-from pytube import YouTube
-from st_audiorec import st_audiorec
+from deepgram import LiveOptions, PrerecordedOptions
 from st_social_media_links import SocialMediaIcons
-from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from playground.batch import BatchTranscriber
+from playground.cache import TranscriptCache, hash_audio
+from playground.captions import FORMATS, MAX_CHARS, MAX_DURATION, cues, webvtt
+from playground.client import PooledDeepgramClient
+from playground.metrics import Metrics, stage
+from playground.pipeline import (
+    AUTO_LANGUAGE,
+    BATCH_MAX_IN_FLIGHT,
+    CACHE_DIR,
+    CACHE_TTL_DAYS,
+    LANGUAGES,
+    MODELS,
+    deepgram_client,
+    fingerprint_index,
+    live_options,
+    prerecorded_options,
+    source_name,
+    transcript_cache,
+)
+from playground.results import ParsedResponse, channel_transcript, parse_response
+from playground.scheduler import QueueStatus, is_rate_limited, session
+from playground.transcribe import (
+    Transcription,
+    shared_source,
+    source_digest,
+    transcribe,
+)
+
+if TYPE_CHECKING:
+    # Only imported once their modes are used, to keep cold starts and reruns fast
+    import pyarrow as pa
+    from streamlit_webrtc import WebRtcStreamerContext
+
+    from playground.fingerprint import FingerprintIndex
+    from playground.live import LiveTranscriber
+    from playground.search import TranscriptIndex
+    from playground.youtube import SharedDownload, YouTubeIngest
+
+_run_started = time.perf_counter()
 
 # Configs
 __version__ = "1.0.3"
 
+SAMPLE_FILE = "assets/sample_file.wav"
+RENDER_BUDGET_MS = float(os.getenv("DEEPGRAM_PLAYGROUND_RENDER_BUDGET_MS", "300"))
+# The first render in a process also does one-off setup, such as loading Streamlit secrets
+COLD_START_BUDGET_MS = float(os.getenv("DEEPGRAM_PLAYGROUND_COLD_START_BUDGET_MS", "1000"))
+
+COMPRESSION_CODECS = {"Off": None, "FLAC": "flac", "Opus": "opus"}
+LIVE_CHUNK_SIZE = 8192
+LIVE_QUEUE_SIZE = 32
+LIVE_FRAME_RATE = 4
+LIVE_MAX_UTTERANCES = 500
+LIVE_MAX_RETRIES = 5
+LIVE_LOG_DIR = os.path.join(CACHE_DIR, "live")
+LIVE_LOG_MAX_MB = 8
+LIVE_LOG_ROTATE_MINUTES = 60
+LIVE_LOG_FSYNC_SECONDS = 1.0
+LIVE_LOG_STALL_SECONDS = 10
+RECORDING_BUFFER_SECONDS = 30
+RECORDING_RECEIVER_FRAMES = 256
+CAPTION_PREVIEW_CUES = 20
+COMPARE_COLUMNS = 3
+COMPARE_HEIGHT = 300
+COMPARE_DIFF_EDITS = 3000
+# Features a comparison can flip for the first model, by label
+COMPARED_FEATURES = {
+    "Smart format": "smart_format",
+    "Punctuation": "punctuate",
+    "Diarization": "diarize",
+    "Profanity filter": "profanity_filter",
+}
+
 st.set_page_config(
     page_title="Deepgram API Playground",
     page_icon="▶️",
@@ -36,159 +110,859 @@ st.caption(
     "A feature-rich API playground for Deepgram's SoTA Speech-to-Text and Speech-Recognition models 🚀"
 )
 
-MODELS = {
-    "Nova-2": "nova-2-ea",
-    "Nova": "nova",
-    "Whisper Cloud": "whisper-medium",
-    "Enhanced": "enhanced",
-    "Base": "base",
-}
 
-LANGUAGES = {
-    "Automatic Language Detection": None,
-    "English": "en",
-    "French": "fr",
-    "Hindi": "hi",
-}
+@st.cache_resource(max_entries=64)
+def _get_deepgram_client(api_key: str) -> PooledDeepgramClient:
+    """One client, with its connection pool and scheduler, per API key for the process's life.
 
+    Created on the first request rather than the first page view, to keep cold starts fast.
+    """
+    return deepgram_client(api_key)
 
-@st.cache_data
-def _read_from_youtube(url: str) -> str:
-    yt = YouTube(url)
 
-    video = yt.streams.filter(only_audio=True).first()
+@st.cache_resource
+def _cold_start() -> Dict[str, bool]:
+    """Whether the first render of this process is still to be measured"""
+    return {"pending": True}
 
-    out_file = video.download()
-    base, ext = os.path.splitext(out_file)
-    audio_file = f"{base}.mp3"
 
-    if os.path.isfile(audio_file):
-        os.remove(audio_file)
-    os.rename(out_file, audio_file)
+@st.cache_resource
+def _load_sidebar_html() -> str:
+    with open("sidebar.html", "r", encoding="UTF-8") as sidebar_file:
+        return sidebar_file.read().replace("{VERSION}", __version__)
 
-    return audio_file
 
+@st.cache_resource
+def _load_sample() -> bytes:
+    with open(SAMPLE_FILE, "rb") as sample_file:
+        return sample_file.read()
 
-def streaming(url: str, options: LiveOptions):
-    try:
-        # Create a websocket connection to Deepgram
-        dg_connection = deepgram.listen.live.v("1")
-        ctx = get_script_run_ctx()
-
-        def on_open(self, open, **kwargs):
-            st.info(
-                "Use the 'Stop' button at the top right to stop transcription",
-                icon="⏹️",
-            )
-            st.info("Starting transcription...")
 
-        def on_message(self, result, **kwargs):
-            add_script_run_ctx(threading.current_thread(), ctx)
-            sentence = result.channel.alternatives[0].transcript
-            if len(sentence) > 0:
-                st.text(sentence)
+@st.cache_resource
+def _get_metrics() -> Metrics:
+    """Request, render and live stream metrics, across all sessions"""
+    return Metrics()
 
-        def on_close(self, close, **kwargs):
-            st.warning("Stopping stream...")
 
-        dg_connection.on(LiveTranscriptionEvents.Open, on_open)
-        dg_connection.on(LiveTranscriptionEvents.Transcript, on_message)
-        dg_connection.on(LiveTranscriptionEvents.Close, on_close)
+@st.cache_resource
+def _get_transcript_cache() -> TranscriptCache:
+    return transcript_cache()
 
-        if dg_connection.start(options) is False:
-            st.error("Failed to start connection")
-            return
 
-        lock_exit = threading.Lock()
-        exit = False
+@st.cache_resource
+def _get_fingerprint_index() -> Optional["FingerprintIndex"]:
+    """Fingerprints of transcribed audio, to spot re-encoded or trimmed copies of it"""
+    if (index := fingerprint_index()) is not None:
+        from playground.fingerprint import prune
 
-        # define a worker thread
-        def myThread():
-            with httpx.stream("GET", url) as r:
-                for data in r.iter_bytes():
-                    lock_exit.acquire()
-                    if exit:
-                        break
-                    lock_exit.release()
+        # Forget transcripts evicted by earlier runs, or other replicas, in the background
+        threading.Thread(
+            target=prune,
+            args=(index, _get_transcript_cache()),
+            name="fingerprint-prune",
+            daemon=True,
+        ).start()
+    return index
 
-                    dg_connection.send(data)
 
-        # start the worker thread
-        myHttp = threading.Thread(target=myThread)
-        myHttp.start()
+@st.cache_resource
+def _get_transcript_index() -> "TranscriptIndex":
+    from playground.search import TranscriptIndex, sync
 
-        # signal finished
-        input("")
-        lock_exit.acquire()
-        exit = True
-        lock_exit.release()
+    index = TranscriptIndex(os.path.join(CACHE_DIR, "search.sqlite3"))
+    # Catch up with transcripts cached by earlier runs, or other replicas, in the background
+    threading.Thread(
+        target=sync, args=(index, _get_transcript_cache()), name="search-sync", daemon=True
+    ).start()
+    return index
 
-        # Wait for the HTTP thread to close and join
-        myHttp.join()
 
-        # Indicate that we've finished
-        dg_connection.finish()
+def _source_audio(source: dict) -> Optional[str]:
+    """Where search hits can play the audio from later, if anywhere"""
+    return source.get("url") or source.get("path")
 
-        st.success("Finished")
 
-    except Exception as e:
-        print(f"Could not open socket: {e}")
-        return
+def _audio_digest(source: dict) -> str:
+    """Content hash of the audio behind `source`, memoized so large files are hashed once"""
+    buffer = source.get("buffer")
+    if getattr(buffer, "file_id", None):
+        # Uploaded file: hash once per upload rather than once per rerun
+        digests = st.session_state.setdefault("audio_digests", {})
+        if buffer.file_id not in digests:
+            digests[buffer.file_id] = hash_audio(buffer)
+        return digests[buffer.file_id]
+    return source_digest(source, _get_transcript_cache())
 
 
-@st.cache_data
-def prerecorded(source, options: PrerecordedOptions) -> None:
-    if audio_yt != "Audio URL":
-        payload: FileSource = {"buffer": source["buffer"]}
-        response = (
-            deepgram.listen.prerecorded.v("1")
-            .transcribe_file(
-                payload,
-                options,
+@st.cache_resource
+def _get_youtube_ingest() -> "YouTubeIngest":
+    from playground.youtube import YouTubeIngest
+
+    return YouTubeIngest()
+
+
+def _read_from_youtube(url: str) -> "SharedDownload":
+    """Start (or join) the download of the video's audio, shared with other sessions"""
+    return _get_youtube_ingest().acquire(url, get_script_run_ctx().session_id)
+
+
+@st.cache_resource
+def _get_live_runs() -> Dict[str, "LiveTranscriber"]:
+    """Running live transcriptions by id, so a reconnecting browser can pick them up again"""
+    from playground.segmentlog import prune
+
+    prune(LIVE_LOG_DIR, CACHE_TTL_DAYS * 24 * 60 * 60)
+    return {}
+
+
+def _live_log_dir(live_id: str) -> Optional[str]:
+    # The id comes from the URL, so it must not be able to point anywhere else
+    if re.fullmatch(r"[0-9a-f]{32}", live_id):
+        return os.path.join(LIVE_LOG_DIR, live_id)
+    return None
+
+
+def streaming(urls: list, options: LiveOptions, chunk_size: int) -> None:
+    if live := st.session_state.get("live"):
+        live.stop()
+    from playground.live import LiveTranscriber
+    from playground.segmentlog import SegmentLog
+
+    deepgram = _get_deepgram_client(deepgram_api_key)
+    live_runs = _get_live_runs()
+    for finished in [live_id for live_id, live in live_runs.items() if not live.running]:
+        del live_runs[finished]
+
+    live_id = uuid.uuid4().hex
+    live_runs[live_id] = st.session_state["live"] = LiveTranscriber(
+        deepgram,
+        urls,
+        options,
+        chunk_size=chunk_size,
+        queue_size=LIVE_QUEUE_SIZE,
+        max_utterances=LIVE_MAX_UTTERANCES,
+        max_retries=LIVE_MAX_RETRIES,
+        metrics=_get_metrics(),
+        scheduler=deepgram.scheduler,
+        log=SegmentLog(
+            _live_log_dir(live_id),
+            max_bytes=LIVE_LOG_MAX_MB * 1024 * 1024,
+            max_seconds=LIVE_LOG_ROTATE_MINUTES * 60,
+            fsync_interval=LIVE_LOG_FSYNC_SECONDS,
+        ),
+    ).start()
+    # Reloading the page, or opening this URL elsewhere, resumes following this stream
+    st.query_params["live"] = live_id
+
+
+def _follow_live(
+    live: "LiveTranscriber",
+    poll: Optional[Callable[[float], None]] = None,
+    chunk_seconds: Optional[float] = None,
+) -> None:
+    """Show the transcript as it comes in. `poll`, if any, is called instead of sleeping.
+
+    Audio dropped from a stream that fell behind is reported, in seconds if each chunk of
+    it holds `chunk_seconds` of audio.
+    """
+    if live.running and poll is None:
+        st.info("Use the 'Stop' button to stop transcription", icon="⏹️")
+
+    # A single stream shows its own transcript with interim results merged in place; several
+    # streams share one timestamped transcript of finalized results, under a health table
+    multi_stream = len(live.feeds) > 1
+    transcript = live.store if multi_stream else live.feeds[0].transcript
+    health = st.empty() if multi_stream else None
+    captions = None if multi_stream else st.empty()
+    dropped = None if multi_stream else st.empty()
+
+    # Redraw one element, at most LIVE_FRAME_RATE times a second and only on change
+    placeholder = st.empty()
+    rendered_version = -1
+    queued = False
+    dropped_chunks = 0
+    while True:
+        running = live.running
+        if dropped and live.feeds[0].dropped != dropped_chunks:
+            dropped_chunks = live.feeds[0].dropped
+            lost = (
+                f"{dropped_chunks * chunk_seconds:.1f} s"
+                if chunk_seconds
+                else f"{dropped_chunks} chunks"
             )
-            .to_dict()
-        )
+            dropped.warning(
+                f"The connection fell behind, so {lost} of audio were dropped untranscribed",
+                icon="⚠️",
+            )
+        if captions and (live.feeds[0].status == "queued") != queued:
+            queued = not queued
+            captions.caption(
+                "⏳ Waiting for a free live connection on this API key" if queued else ""
+            )
+        if health:
+            health.dataframe(
+                [feed.health() for feed in live.feeds], width="stretch", hide_index=True
+            )
+        if transcript.version != rendered_version:
+            rendered_version = transcript.version
+            placeholder.text(transcript.text())
+            if captions and live.feeds[0].captions:
+                captions.caption(f"💬 {live.feeds[0].captions[-1].text}")
+        if not running:
+            break
+        if poll:
+            poll(1 / LIVE_FRAME_RATE)
+        else:
+            time.sleep(1 / LIVE_FRAME_RATE)
 
+    if live.error:
+        st.error(f"Could not transcribe stream: {live.error}")
+    elif failed := [feed for feed in live.feeds if feed.status == "failed"]:
+        for feed in failed:
+            st.error(f"Could not transcribe {feed.url}: {feed.error}")
     else:
-        response = (
-            deepgram.listen.prerecorded.v("1")
-            .transcribe_url(
-                source,
+        st.success("Finished")
+
+    if not multi_stream and live.feeds[0].captions:
+        st.download_button(
+            "⬇️ Download captions (WebVTT)",
+            data="".join(webvtt(list(live.feeds[0].captions))),
+            file_name="captions.vtt",
+            mime="text/vtt",
+            on_click="ignore",
+        )
+    if live.log:
+        _live_log_download(live.log.directory)
+
+
+def _record_live(recorder: "WebRtcStreamerContext", options: LiveOptions) -> None:
+    """Transcribe the microphone while it records, so the transcript is ready when it stops"""
+    from playground.live import LiveTranscriber
+    from playground.recorder import (
+        CHUNK_SECONDS,
+        SAMPLE_RATE,
+        MicrophoneRelay,
+        recording_source,
+    )
+
+    deepgram = _get_deepgram_client(deepgram_api_key)
+    recording = st.session_state.get("recording")
+    if recorder.state.playing and recorder.audio_receiver:
+        if recording is None or recording.feeds[0].source.closed:
+            options.encoding, options.sample_rate, options.channels = "linear16", SAMPLE_RATE, 1
+            recording = st.session_state["recording"] = LiveTranscriber(
+                deepgram,
+                [recording_source(RECORDING_BUFFER_SECONDS)],
                 options,
+                max_utterances=LIVE_MAX_UTTERANCES,
+                max_retries=LIVE_MAX_RETRIES,
+                metrics=_get_metrics(),
+                scheduler=deepgram.scheduler,
+            ).start()
+        relay = MicrophoneRelay(recording.feeds[0].source)
+
+        # Frames are relayed from this loop, which reruns (and picks up again) on every interaction
+        def poll(timeout: float) -> None:
+            with contextlib.suppress(queue.Empty):
+                relay(recorder.audio_receiver.get_frames(timeout=timeout))
+
+        st.info("Transcribing as you speak. Stop the recorder to finish", icon="🎙️")
+        _follow_live(recording, poll, CHUNK_SECONDS)
+    elif recording:
+        # Stopping the recorder reran the script: the rest of the audio is sent and finalized
+        recording.feeds[0].source.close()
+        _follow_live(recording, chunk_seconds=CHUNK_SECONDS)
+
+
+def _live_log_download(directory: str) -> None:
+    from playground.segmentlog import read_bytes
+
+    st.download_button(
+        "⬇️ Download transcript log (JSONL)",
+        data=functools.partial(read_bytes, directory),
+        file_name="live_transcript.jsonl",
+        mime="application/jsonl",
+        on_click="ignore",
+    )
+
+
+def _replay_live(directory: str) -> None:
+    """Transcript of a live run from its log, following it while something still writes to it"""
+    from playground.live import Segment, TranscriptStore
+    from playground.segmentlog import LogTail
+
+    tail = LogTail(directory)
+    store = TranscriptStore()
+    placeholder = st.empty()
+    started = time.monotonic()
+    while True:
+        for record in tail.read():
+            if record["type"] == "result":
+                store.add(
+                    Segment(record["received"], record["stream"], record["start"], record["text"])
+                )
+        placeholder.text(store.text())
+        # A writer that stopped without ending the log (say, a restarted server) isn't waited on
+        last_record_at = tail.last_record_at or started
+        if tail.ended or time.monotonic() - last_record_at > LIVE_LOG_STALL_SECONDS:
+            break
+        time.sleep(1 / LIVE_FRAME_RATE)
+
+    if not store.version:
+        st.info("Nothing was transcribed in this live session", icon="ℹ️")
+        return
+    st.caption("Replayed from the transcript log" if tail.ended else "The stream was interrupted")
+    _live_log_download(directory)
+
+
+def _show_queue_status(placeholder, status: QueueStatus) -> None:
+    eta = f", starting in about {status.eta:.0f} s" if status.eta is not None else ""
+    placeholder.info(
+        f"Many requests are using this API key: yours is number {status.position} in line{eta}",
+        icon="⏳",
+    )
+
+
+def prerecorded(source: dict, options: PrerecordedOptions) -> None:
+    deepgram = _get_deepgram_client(deepgram_api_key)
+    queue_status = st.empty()
+    with _get_metrics().trace("prerecorded", source_name(source)) as trace:
+        with stage("hash"):
+            audio_digest = _audio_digest(source)
+        # Queued with this session's other requests, showing its place in line while it waits
+        try:
+            with session(
+                get_script_run_ctx().session_id, functools.partial(_show_queue_status, queue_status)
+            ):
+                transcription = transcribe(
+                    deepgram,
+                    source,
+                    options,
+                    _get_transcript_cache(),
+                    audio_digest,
+                    preprocess=COMPRESSION_CODECS[compression],
+                    chunk_seconds=chunk_minutes and chunk_minutes * 60,
+                    max_in_flight=BATCH_MAX_IN_FLIGHT,
+                    fingerprints=_get_fingerprint_index(),
+                )
+        finally:
+            queue_status.empty()
+        trace.cached = transcription.cached
+        trace.audio_seconds = transcription.response.get("metadata", {}).get("duration")
+        with stage("words"):
+            parsed = parse_response(transcription.response)
+        with stage("index"):
+            _get_transcript_index().add(
+                transcription.key, source_name(source), parsed.words, _source_audio(source)
             )
-            .to_dict()
+    if transcription.shared:
+        st.toast("Joined an identical request already in progress", icon="⚡")
+    elif near_duplicate := transcription.response["metadata"].get("near_duplicate_of"):
+        st.toast(
+            f"Reused the transcript of a near-identical recording, from "
+            f"{near_duplicate['offset']:.1f} s into it",
+            icon="⚡",
         )
+    elif transcription.cached:
+        st.toast("Served from the transcript cache", icon="⚡")
 
-    # Write the response to the console
-    if detected_language := response["results"]["channels"][0].get("detected_language", None):
-        st.write(
-            f"🔠 __Detected language:__ {detected_language} ({list(LANGUAGES.keys())[list(LANGUAGES.values()).index(detected_language)]})"
+    # Kept across reruns, since paging through the response reruns the script
+    st.session_state["transcription"] = transcription
+    st.session_state["response_path"] = []
+    st.session_state["parsed_response"] = parsed
+    st.session_state["word_table"] = None
+    st.session_state["audio_start"] = 0
+
+
+def _raw_response(transcript_cache: TranscriptCache, transcription: Transcription) -> bytes:
+    """Read from the cache when the download is requested, instead of being sent with the page"""
+    if path := transcript_cache.path(transcription.key):
+        with open(path, "rb") as response_file:
+            return response_file.read()
+    return json.dumps(transcription.response).encode()
+
+
+def _open_field(widget_key: str) -> None:
+    st.session_state["response_path"].append(st.session_state[widget_key])
+
+
+def _response_viewer(transcription: Transcription) -> None:
+    from playground.viewer import is_container, page, page_count, preview, resolve
+
+    # Only the current page of the current node is serialized, with deeper levels summarized
+    path = st.session_state.setdefault("response_path", [])
+    node = resolve(transcription.response, path)
+    path_key = "/".join(map(str, path))
+
+    lcol, rcol = st.columns([1, 5], vertical_alignment="center")
+    lcol.button("⬆️ Up", disabled=not path, on_click=path.pop if path else None)
+    rcol.caption(" › ".join(["response", *map(str, path)]))
+
+    pages = page_count(node)
+    number = (
+        st.number_input(f"Page (of {pages})", 1, pages, key=f"response_page_{path_key}")
+        if pages > 1
+        else 1
+    )
+    items = page(node, number)
+    st.json({str(key): preview(value) for key, value in items}, expanded=2)
+
+    if fields := [key for key, value in items if is_container(value)]:
+        widget_key = f"response_open_{path_key}"
+        st.selectbox(
+            "Expand",
+            options=fields,
+            index=None,
+            placeholder="Open a field...",
+            key=widget_key,
+            on_change=_open_field,
+            args=(widget_key,),
         )
 
-    # FIXME: Parse multichannel response
-    if summarize:
-        tab1, tab2, tab3 = st.tabs(["📝Response", "🗒️Transcript", "🤏Summary"])
-        try:
-            tab3.write(
-                response["results"]["channels"][0]["alternatives"][0]["summaries"][0]["summary"]
+    st.download_button(
+        "⬇️ Download raw JSON",
+        data=functools.partial(_raw_response, _get_transcript_cache(), transcription),
+        file_name="response.json",
+        mime="application/json",
+        on_click="ignore",
+    )
+
+
+def _parsed(transcription: Transcription) -> ParsedResponse:
+    """Parsed once per transcription, and shared by every view"""
+    if st.session_state.get("parsed_response") is None:
+        st.session_state["parsed_response"] = parse_response(transcription.response)
+    return st.session_state["parsed_response"]
+
+
+def _word_table(parsed: ParsedResponse) -> "pa.Table":
+    if st.session_state.get("word_table") is None:
+        from playground.viewer import word_table
+
+        st.session_state["word_table"] = word_table(parsed.words)
+    return st.session_state["word_table"]
+
+
+def _pick_channel(parsed: ParsedResponse, key: str, interleaved: bool = False) -> Optional[int]:
+    """Channel to show, or None for all channels interleaved"""
+    if len(parsed.channels) == 1:
+        return 0
+    options = ([None] if interleaved else []) + [channel.index for channel in parsed.channels]
+    return st.radio(
+        "Channel",
+        options=options,
+        format_func=lambda c: "All channels" if c is None else f"Channel {c}",
+        horizontal=True,
+        key=key,
+    )
+
+
+def _interleaved_transcript(parsed: ParsedResponse) -> str:
+    return "\n".join(
+        f"[{time.strftime('%H:%M:%S', time.gmtime(turn.start))}] Channel {turn.channel}"
+        + (f", Speaker {turn.speaker}" if turn.speaker is not None else "")
+        + f": {turn.text}"
+        for turn in parsed.words.turns()
+    )
+
+
+def _captions(parsed: ParsedResponse) -> None:
+    channel = _pick_channel(parsed, "caption_channel")
+    lcol, mcol, rcol = st.columns(3)
+    caption_format = lcol.radio("Caption format", options=list(FORMATS), horizontal=True)
+    max_chars = mcol.number_input("Max characters per line", 16, 80, MAX_CHARS)
+    max_duration = rcol.number_input("Max cue duration (s)", 1.0, 15.0, MAX_DURATION, step=0.5)
+    speaker_labels = st.checkbox("Speaker labels", value=True)
+    write, extension, mime = FORMATS[caption_format]
+
+    def captions():
+        words = parsed.words.words(channel)
+        return write(cues(words, max_chars=max_chars, max_duration=max_duration), speaker_labels)
+
+    # Cues are generated lazily: the preview only builds the first few, and the file is only
+    # built when downloaded
+    st.code("".join(itertools.islice(captions(), CAPTION_PREVIEW_CUES)), language=None)
+    st.download_button(
+        f"⬇️ Download {caption_format}",
+        data=lambda: "".join(captions()),
+        file_name=f"captions.{extension}",
+        mime=mime,
+        on_click="ignore",
+    )
+
+
+def _show_transcription(transcription: Transcription) -> None:
+    started = time.perf_counter()
+    parsed = _parsed(transcription)
+    multichannel = len(parsed.channels) > 1
+
+    # Write the response to the console
+    language_names = {code: name for name, code in LANGUAGES.items()}
+    for channel in parsed.channels:
+        if channel.detected_language:
+            st.write(
+                f"🔠 __Detected language{f' (channel {channel.index})' if multichannel else ''}:__ "
+                f"{channel.detected_language} "
+                f"({language_names.get(channel.detected_language, 'unlisted')})"
             )
-        except Exception as e:
-            st.error(e)
+
+    tab_names = ["📝Response", "🗒️Transcript", "🔤Words", "💬Captions"]
+    if summarize:
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(tab_names + ["🤏Summary"])
+        with tab5:
+            for channel in parsed.channels:
+                if multichannel:
+                    st.caption(f"Channel {channel.index}")
+                if channel.summaries:
+                    st.write("\n\n".join(channel.summaries))
+                else:
+                    st.info("No summary was returned", icon="ℹ️")
     else:
-        tab1, tab2 = st.tabs(["📝Response", "🗒️Transcript"])
+        tab1, tab2, tab3, tab4 = st.tabs(tab_names)
     try:
-        tab1.write(response)
+        with tab1:
+            _response_viewer(transcription)
     except Exception as e:
         st.error(e)
     try:
-        if paragraphs or smart_format:
-            tab2.write(
-                response["results"]["channels"][0]["alternatives"][0]["paragraphs"]["transcript"]
-            )
-        else:
-            tab2.write(response["results"]["channels"][0]["alternatives"][0]["transcript"])
+        with tab2:
+            channel = _pick_channel(parsed, "transcript_channel", interleaved=True)
+            if channel is None:
+                st.text(_interleaved_transcript(parsed))
+            else:
+                st.write(parsed.channels[channel].transcript)
     except Exception as e:
         st.error(e)
+    try:
+        tab3.dataframe(
+            _word_table(parsed),
+            width="stretch",
+            hide_index=True,
+            column_order=None
+            if multichannel
+            else ["word", "start", "end", "confidence", "speaker"],
+        )
+    except Exception as e:
+        st.error(e)
+    try:
+        with tab4:
+            _captions(parsed)
+    except Exception as e:
+        st.error(e)
+
+    cache_stats = _get_transcript_cache().stats()
+    st.caption(
+        f"⚡ Transcript cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+        f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1024 / 1024:.1f} MB)"
+    )
+    _get_metrics().observe("render_seconds", time.perf_counter() - started, view="results")
+
+
+def _seek_to_hit() -> None:
+    if rows := st.session_state["search_hits"].selection.rows:
+        st.session_state["search_selected"] = st.session_state["search_results"][rows[0]]
+        transcription = st.session_state.get("transcription")
+        if transcription and transcription.key == st.session_state["search_selected"].key:
+            st.session_state["audio_start"] = st.session_state["search_selected"].start
+    else:
+        st.session_state["search_selected"] = None
+
+
+def _search_transcripts() -> None:
+    with st.expander("🔎 Search transcripts"):
+        transcript_index = _get_transcript_index()
+        query = st.text_input(
+            "Search all transcribed audio",
+            placeholder="Words or a phrase",
+            help="""Searches every transcript produced so far, locally and without any API 
+            requests. Select a result to play the audio from there""",
+        )
+        if not query:
+            st.caption(f"{transcript_index.stats()['recordings']} recordings indexed")
+            return
+
+        hits = transcript_index.search(query)
+        if query != st.session_state.get("search_query"):
+            st.session_state["search_query"] = query
+            st.session_state["search_results"] = hits
+            st.session_state["search_selected"] = None
+        if not hits:
+            st.info("No matches", icon="🔎")
+            return
+
+        st.dataframe(
+            [
+                {
+                    "Recording": hit.name,
+                    "Time": time.strftime("%H:%M:%S", time.gmtime(hit.start)),
+                    "Channel": hit.channel,
+                    "Speaker": hit.speaker,
+                    "Match": hit.snippet,
+                }
+                for hit in hits
+            ],
+            width="stretch",
+            hide_index=True,
+            key="search_hits",
+            on_select=_seek_to_hit,
+            selection_mode="single-row",
+        )
+
+        # Hits in the current recording seek its player; others get a player of their own
+        transcription = st.session_state.get("transcription")
+        if (hit := st.session_state.get("search_selected")) and not (
+            transcription and transcription.key == hit.key
+        ):
+            if hit.audio:
+                st.audio(hit.audio, start_time=int(hit.start), autoplay=True)
+            else:
+                st.caption("The audio of this recording is no longer available to play")
+
+
+def _diagnostics() -> None:
+    metrics = _get_metrics()
+    expander = st.expander("🩺 Diagnostics", key="diagnostics", on_change="rerun")
+    with expander:
+        # Building the tables loads pandas and pyarrow, so only once someone looks at them
+        if not expander.open:
+            return
+        st.caption("Where the time goes, across all sessions of this server")
+        if summary := metrics.summary():
+            st.dataframe(summary, width="stretch", hide_index=True)
+
+        if traces := list(metrics.traces)[-20:]:
+            st.write("__Recent requests__ (stage times in ms)")
+            st.dataframe(
+                [
+                    {
+                        "Started": time.strftime("%H:%M:%S", time.localtime(trace.started)),
+                        "Kind": trace.kind,
+                        "Source": trace.name,
+                        "Cached": trace.cached,
+                        **{
+                            stage_name: round(seconds * 1000, 1)
+                            for stage_name, seconds in trace.stages.items()
+                        },
+                        "Sent (MB)": round(trace.bytes_sent / 1024 / 1024, 2),
+                        "Error": trace.error,
+                    }
+                    for trace in reversed(traces)
+                ],
+                width="stretch",
+                hide_index=True,
+            )
+
+        lcol, rcol = st.columns(2)
+        lcol.download_button(
+            "⬇️ Prometheus/OpenMetrics",
+            data=metrics.openmetrics,
+            file_name="metrics.txt",
+            mime="application/openmetrics-text; version=1.0.0; charset=utf-8",
+            on_click="ignore",
+            width="stretch",
+        )
+        rcol.download_button(
+            "⬇️ Request traces (JSONL)",
+            data=lambda: "".join(metrics.jsonl()),
+            file_name="traces.jsonl",
+            mime="application/jsonl",
+            on_click="ignore",
+            width="stretch",
+        )
+
+
+def batch_prerecorded(
+    sources: list, options: PrerecordedOptions, max_in_flight: int, rate: float
+) -> None:
+    deepgram = _get_deepgram_client(deepgram_api_key)
+    transcript_cache = _get_transcript_cache()
+    transcript_index = _get_transcript_index()
+    metrics = _get_metrics()
+    session_id = get_script_run_ctx().session_id
+
+    def transcribe_and_index(source: dict) -> Transcription:
+        with metrics.trace("batch", source_name(source)) as trace, session(session_id):
+            with stage("hash"):
+                audio_digest = source_digest(source, transcript_cache)
+            transcription = transcribe(
+                deepgram,
+                source,
+                options,
+                transcript_cache,
+                audio_digest,
+                preprocess=COMPRESSION_CODECS[compression],
+                chunk_seconds=chunk_minutes and chunk_minutes * 60,
+                fingerprints=_get_fingerprint_index(),
+            )
+            trace.cached = transcription.cached
+            trace.audio_seconds = transcription.response.get("metadata", {}).get("duration")
+            with stage("words"):
+                words = parse_response(transcription.response).words
+            with stage("index"):
+                transcript_index.add(
+                    transcription.key, source_name(source), words, _source_audio(source)
+                )
+        return transcription
+
+    batch = BatchTranscriber(
+        transcribe_and_index,
+        max_in_flight=max_in_flight,
+        rate=rate or None,
+    )
+
+    progress = st.progress(0.0, text=f"Transcribing {len(sources)} files...")
+    summary = []
+    for done, result in enumerate(batch.run(sources), start=1):
+        text = f"Transcribed {done}/{len(sources)} files"
+        if status := deepgram.scheduler.status(session_id):
+            # Other sessions are using the API key too, and take turns with this batch
+            text += f" (next request number {status.position} in line for the API key)"
+        progress.progress(done / len(sources), text=text)
+        with st.expander(f"{'❌' if result.error else '✅'} {result.name}"):
+            if result.error:
+                st.error(result.error)
+            else:
+                try:
+                    for channel in result.response["results"]["channels"]:
+                        st.write(channel_transcript(channel))
+                except Exception as e:
+                    st.error(e)
+        summary.append(
+            {
+                "File": result.name,
+                "Status": "Failed" if result.error else "Cached" if result.cached else "Done",
+                "Attempts": result.attempts,
+                "Seconds": round(result.elapsed, 2),
+            }
+        )
+
+    st.dataframe(summary, width="stretch", hide_index=True)
+
+
+def compare_prerecorded(source: dict, variants: list, reference: str) -> None:
+    """Transcribe `source` with every option set in `variants` concurrently, and diff the results"""
+    from playground.compare import align, normalize, word_errors
+
+    deepgram = _get_deepgram_client(deepgram_api_key)
+    transcript_cache = _get_transcript_cache()
+    metrics = _get_metrics()
+    session_id = get_script_run_ctx().session_id
+    name = source_name(source)
+    audio_digest = _audio_digest(source)
+    # Read once, then sent to Deepgram once per option set
+    copy_source = shared_source(source)
+
+    def transcribe_variant(variant: dict) -> Transcription:
+        with metrics.trace("compare", f"{name} ({variant['name']})") as trace, session(session_id):
+            transcription = transcribe(
+                deepgram,
+                copy_source(),
+                variant["options"],
+                transcript_cache,
+                audio_digest,
+                preprocess=COMPRESSION_CODECS[compression],
+                chunk_seconds=chunk_minutes and chunk_minutes * 60,
+                fingerprints=_get_fingerprint_index(),
+            )
+            trace.cached = transcription.cached
+            trace.audio_seconds = transcription.response.get("metadata", {}).get("duration")
+        return transcription
+
+    batch = BatchTranscriber(transcribe_variant, max_in_flight=len(variants))
+    with st.spinner(f"Transcribing with {len(variants)} option sets..."):
+        results = {
+            result.name: result
+            for result in batch.run(
+                (variant_name, {"name": variant_name, "options": options})
+                for variant_name, options in variants
+            )
+        }
+
+    rows = []
+    for variant_name, _ in variants:
+        result = results[variant_name]
+        words = [] if result.error else parse_response(result.response).words.text
+        rows.append({"name": variant_name, "result": result, "words": words, "edits": None})
+
+    # Measured against the reference transcript if there is one, or else the first model
+    if reference.strip():
+        baseline, baseline_words = "reference", reference.split()
+    elif succeeded := [row for row in rows if not row["result"].error]:
+        baseline, baseline_words = succeeded[0]["name"], succeeded[0]["words"]
+    else:
+        baseline, baseline_words = None, []
+    for row in rows:
+        if baseline and row["name"] != baseline and not row["result"].error:
+            row["edits"] = align(normalize(baseline_words), normalize(row["words"]))
+            row["errors"] = word_errors(row["edits"])
+
+    st.session_state["comparison"] = {
+        "rows": rows,
+        "baseline": baseline,
+        "baseline_words": baseline_words,
+    }
+
+
+def _word_diff(reference: list, hypothesis: list, edits: list) -> str:
+    """Hypothesis as HTML, with words missing from the reference struck out"""
+    parts = []
+    for edit in edits[:COMPARE_DIFF_EDITS]:
+        if edit.op == "equal":
+            parts.append(html.escape(hypothesis[edit.hypothesis]))
+            continue
+        if edit.reference is not None:
+            parts.append(f"<del>{html.escape(reference[edit.reference])}</del>")
+        if edit.hypothesis is not None:
+            parts.append(f"<ins>{html.escape(hypothesis[edit.hypothesis])}</ins>")
+    if len(edits) > COMPARE_DIFF_EDITS:
+        parts.append(f"<em>... {len(edits) - COMPARE_DIFF_EDITS} more words</em>")
+    return (
+        "<style>del {color: #d33} ins {color: #2a2; text-decoration: none}</style>"
+        f"<div>{' '.join(parts)}</div>"
+    )
+
+
+def _show_comparison(comparison: dict) -> None:
+    rows = comparison["rows"]
+    baseline = comparison["baseline"]
+    table = []
+    billed = 0.0
+    for row in rows:
+        result = row["result"]
+        duration = None if result.error else result.response["metadata"].get("duration")
+        if duration and not result.cached:
+            billed += duration
+        errors = row.get("errors")
+        table.append(
+            {
+                "Option set": row["name"],
+                "Status": "Failed" if result.error else "Cached" if result.cached else "Done",
+                "Latency (s)": round(result.elapsed, 2),
+                "Audio (s)": duration and round(duration, 1),
+                "Words": len(row["words"]),
+                f"WER vs {baseline} (%)": errors and round(errors.rate * 100, 1),
+                "Substitutions": errors and errors.substitutions,
+                "Deletions": errors and errors.deletions,
+                "Insertions": errors and errors.insertions,
+            }
+        )
+    st.dataframe(table, width="stretch", hide_index=True)
+    st.caption(f"🧾 {billed / 60:.1f} minutes of audio billed. Cached results are free")
+
+    for start in range(0, len(rows), COMPARE_COLUMNS):
+        for column, row in zip(st.columns(COMPARE_COLUMNS), rows[start : start + COMPARE_COLUMNS]):
+            with column:
+                st.markdown(f"**{row['name']}**")
+                if row["result"].error:
+                    st.error(row["result"].error)
+                    continue
+                with st.container(height=COMPARE_HEIGHT):
+                    if row["edits"] is None:
+                        st.text(" ".join(row["words"]))
+                    else:
+                        st.html(
+                            _word_diff(comparison["baseline_words"], row["words"], row["edits"])
+                        )
 
 
 lcol, mcol, rcol = st.columns(3)
@@ -198,23 +972,16 @@ audio_format = lcol.selectbox(
         "Prerecorded",
         "Streaming",
     ],
+    # Following a live run from its URL
+    index=int("live" in st.query_params),
 )
 
-if audio_format == "Streaming":
-    del LANGUAGES["Automatic Language Detection"]
-
 language = mcol.selectbox(
     "🔠 Language",
-    options=list(LANGUAGES.keys()),
+    options=[name for name in LANGUAGES if audio_format != "Streaming" or name != AUTO_LANGUAGE],
     help="⚠️Some features are [only accessible in certain languages](https://developers.deepgram.com/documentation/features/)",
 )
 
-lang_options = {
-    "detect_language"
-    if language == "Automatic Language Detection"
-    else "language": (True if language == "Automatic Language Detection" else LANGUAGES[language])
-}
-
 model = rcol.selectbox(
     "🤖 Model",
     options=list(MODELS.keys()),
@@ -236,17 +1003,15 @@ with st.sidebar:
         )
 
         if deepgram_api_key == "":
-            if "DEEPGRAM_API_KEY" in st.secrets:
-                deepgram_api_key = st.secrets["DEEPGRAM_API_KEY"]
-            elif "DEEPGRAM_API_KEY" in os.environ:
+            # The environment first: loading secrets for the first time takes a while
+            if "DEEPGRAM_API_KEY" in os.environ:
                 deepgram_api_key = os.getenv("DEEPGRAM_API_KEY")
+            elif "DEEPGRAM_API_KEY" in st.secrets:
+                deepgram_api_key = st.secrets["DEEPGRAM_API_KEY"]
             else:
                 st.error("Please enter your Deepgram API key to continue")
                 st.stop()
 
-        deepgram = DeepgramClient(deepgram_api_key)
-
-    # TODO: Add WebVTT/SRT captions (https://developers.deepgram.com/docs/automatically-generating-webvtt-and-srt-captions)
     # TODO: Add find&replace, keywords, sample rate
     # TODO: Better handling of disabled features (don't turn on by default)
     # FIXME: Handle case when language is changed after unsupported feature is selected
@@ -288,6 +1053,14 @@ with st.sidebar:
             disabled=audio_format != "Streaming",
         )
 
+        compression = st.selectbox(
+            "Compress before upload",
+            options=list(COMPRESSION_CODECS.keys()),
+            help="""Downmix to mono (unless Multichannel is on), resample to 16 kHz and compress 
+            local audio before uploading it. FLAC is lossless; Opus is several times smaller still""",
+            disabled=audio_format != "Prerecorded",
+        )
+
         endpointing = st.checkbox(
             "Endpointing",
             help="Returns transcripts when pauses in speech are detected",
@@ -316,6 +1089,24 @@ with st.sidebar:
             disabled=audio_format != "Prerecorded",
         )
 
+        if chunking := st.checkbox(
+            "Parallel chunking",
+            help="""Splits long audio at silences into chunks that are transcribed in parallel and 
+            stitched back together, with consistent timestamps and speaker labels. 
+            Avoids timeouts on very long recordings""",
+            disabled=audio_format != "Prerecorded",
+        ):
+            lcol, rcol = st.columns([1, 14])
+            chunk_minutes = rcol.number_input(
+                "Chunk length (minutes)",
+                min_value=1.0,
+                value=5.0,
+                step=1.0,
+                help="Target length of each chunk. Chunks are cut at the nearest silence",
+            )
+        else:
+            chunk_minutes = None
+
         profanity_filter = st.checkbox(
             "Profanity filter",
             help="Indicates whether to remove profanity from the transcript",
@@ -401,10 +1192,7 @@ with st.sidebar:
         st.write("📟 [Dev Console](https://console.deepgram.com/)")
         st.write("🤗 [Community Support](https://github.com/orgs/deepgram/discussions/)")
 
-    with open("sidebar.html", "r", encoding="UTF-8") as sidebar_file:
-        sidebar_html = sidebar_file.read().replace("{VERSION}", __version__)
-
-    st.components.v1.html(sidebar_html, height=228)
+    st.iframe(_load_sidebar_html(), height=228)
 
     st.html(
         """
@@ -444,15 +1232,50 @@ with st.sidebar:
     )
 
 
+recorder = None
+compare_models = False
 if audio_format == "Streaming":
-    url = st.text_input(
-        "Streaming audio URL",
-        key="url",
-        value="http://stream.live.vc.bbcmedia.co.uk/bbc_world_service",
+    if st.checkbox(
+        "📡 Monitor multiple streams",
+        help="Transcribe several streams concurrently, one Deepgram connection per stream",
+    ):
+        urls = [
+            line.strip()
+            for line in st.text_area(
+                "Streaming audio URLs",
+                value="http://stream.live.vc.bbcmedia.co.uk/bbc_world_service",
+                help="One stream URL per line",
+            ).splitlines()
+            if line.strip()
+        ]
+    else:
+        url = st.text_input(
+            "Streaming audio URL",
+            key="url",
+            value="http://stream.live.vc.bbcmedia.co.uk/bbc_world_service",
+        )
+        urls = [url] if url else []
+    chunk_size = st.number_input(
+        "Chunk size (bytes)",
+        min_value=1024,
+        max_value=1024 * 1024,
+        value=LIVE_CHUNK_SIZE,
+        step=1024,
+        help="Size of the audio chunks read from the stream and sent to Deepgram",
     )
 
-    options = LiveOptions(
-        model=MODELS[model],
+    if "live" not in st.session_state and (live_id := st.query_params.get("live")):
+        # A reconnecting browser follows the run it started, if it is still going
+        st.session_state["live"] = _get_live_runs().get(live_id)
+    if (live := st.session_state.get("live")) and live.running:
+        if st.button("⏹️ Stop", width="stretch"):
+            live.stop()
+
+    options = live_options(
+        model,
+        language,
+        redact_options,
+        search_terms,
         channels=num_channels,
         diarize=diarize,
         encoding=encoding,
@@ -461,8 +1284,6 @@ if audio_format == "Streaming":
         multichannel=multichannel,
         profanity_filter=profanity_filter,
         punctuate=punctuate,
-        redact=[option for option in redact_options if option],
-        search=f"""[{search_terms or ""}]""",
         smart_format=smart_format,
     )
 
@@ -475,6 +1296,7 @@ elif audio_format == "Prerecorded":
             "️🗣 Record audio️",
             "⬆️ Upload audio file",
             "🌐 Load from URL",
+            "📚 Batch",
         ],
         horizontal=True,
     )
@@ -517,19 +1339,95 @@ elif audio_format == "Prerecorded":
                 st.error(e)
 
     elif audio_source == "️🗣 Record audio️":
-        st.session_state["audio"] = st_audiorec()
+        if importlib.util.find_spec("streamlit_webrtc") and st.toggle(
+            "⚡ Transcribe while recording",
+            value=True,
+            help="Stream the microphone to Deepgram as you speak, so the transcript is ready "
+            "as soon as you stop. Prerecorded-only features don't apply",
+        ):
+            from streamlit_webrtc import WebRtcMode, webrtc_streamer
+
+            st.session_state["audio"] = None
+            recorder = webrtc_streamer(
+                key="recorder",
+                mode=WebRtcMode.SENDONLY,
+                audio_receiver_size=RECORDING_RECEIVER_FRAMES,
+                media_stream_constraints={"audio": True, "video": False},
+            )
+        else:
+            from st_audiorec import st_audiorec
+
+            st.session_state["audio"] = st_audiorec()
+
+    elif audio_source == "📚 Batch":
+        st.session_state["audio"] = None
+        batch_files = st.file_uploader("⬆️ Upload audio files", accept_multiple_files=True)
+        batch_urls = st.text_area(
+            "🌐 Audio URLs",
+            placeholder="https://example.com/audio_1.wav\nhttps://example.com/audio_2.wav",
+            help="Manifest of remote audio files, one URL per line",
+        )
+        lcol, rcol = st.columns(2)
+        max_in_flight = lcol.number_input(
+            "Max in-flight requests",
+            min_value=1,
+            max_value=32,
+            value=BATCH_MAX_IN_FLIGHT,
+            help="Maximum number of files transcribed concurrently",
+        )
+        batch_rate = rcol.number_input(
+            "Rate limit (requests/second)",
+            min_value=0.0,
+            value=0.0,
+            step=0.5,
+            help="Maximum number of requests started per second. Set to 0 for no limit",
+        )
 
     else:
-        st.session_state["audio"] = "assets/sample_file.wav"
+        st.session_state["audio"] = SAMPLE_FILE
 
     if st.session_state["audio"] and audio_source != "️🗣 Record audio️":
+        # Moved by selecting a search hit in this recording
+        start_time = int(st.session_state.get("audio_start", 0))
         if audio_source == "🌐 Load from URL" and audio_yt == "Youtube link":
-            st.video(url)
+            st.video(url, start_time=start_time, autoplay=bool(start_time))
+        elif st.session_state["audio"] == SAMPLE_FILE:
+            st.audio(
+                _load_sample(), format="audio/wav", start_time=start_time, autoplay=bool(start_time)
+            )
         else:
-            st.audio(st.session_state["audio"])
+            st.audio(st.session_state["audio"], start_time=start_time, autoplay=bool(start_time))
+
+    if audio_source != "📚 Batch" and recorder is None:
+        compare_models = st.checkbox(
+            "⚖️ Compare models",
+            help="Transcribe the audio with several models or option sets at once, side by side",
+        )
+    if compare_models:
+        lcol, rcol = st.columns(2)
+        compared_models = lcol.multiselect(
+            "Models",
+            options=list(MODELS),
+            default=[model, next(name for name in MODELS if name != model)],
+        )
+        compared_features = rcol.multiselect(
+            "Also with these features flipped",
+            options=list(COMPARED_FEATURES),
+            help="Each adds a run of the first model with that feature turned on or off",
+        )
+        reference_transcript = st.text_area(
+            "Reference transcript (optional)",
+            help="What was actually said, to measure each word error rate against. "
+            "Without one, the first model is the baseline",
+        )
 
-    options = PrerecordedOptions(
-        model=MODELS[model],
+    _search_transcripts()
+
+    options = prerecorded_options(
+        model,
+        language,
+        redact_options,
+        search_terms,
         channels=num_channels,
         detect_topics=detect_topics,
         diarize=diarize,
@@ -539,13 +1437,39 @@ elif audio_format == "Prerecorded":
         paragraphs=paragraphs,
         profanity_filter=profanity_filter,
         punctuate=punctuate,
-        redact=[option for option in redact_options if option],
         smart_format=smart_format,
         summarize=summarize,
-        search=f"""[{search_terms or ""}]""",
         utterances=utterances,
         utt_split=utt_split,
     )
+    if recorder is not None:
+        # Live streams can't detect their language
+        recording_options = live_options(
+            model,
+            None if language == AUTO_LANGUAGE else language,
+            redact_options,
+            search_terms,
+            diarize=diarize,
+            interim_results=True,
+            profanity_filter=profanity_filter,
+            punctuate=punctuate,
+            smart_format=smart_format,
+        )
+    if compare_models:
+        variants = [
+            (name, dataclasses.replace(options, model=MODELS[name])) for name in compared_models
+        ]
+        if variants:
+            first, first_options = variants[0]
+            for feature in compared_features:
+                attribute = COMPARED_FEATURES[feature]
+                flipped = not getattr(first_options, attribute)
+                variants.append(
+                    (
+                        f"{first}, {feature.lower()} {'on' if flipped else 'off'}",
+                        dataclasses.replace(first_options, **{attribute: flipped}),
+                    )
+                )
 
 if audio_format == "Prerecorded":
     # Check whether requested file is local, uploaded or remote, and prepare source
@@ -554,15 +1478,22 @@ if audio_format == "Prerecorded":
         if audio_yt == "Audio URL":
             source = {"url": url}
         else:
-            source = {"buffer": open(st.session_state["audio"], "rb")}
+            source = {"download": st.session_state["audio"]}
+    elif audio_source == "📚 Batch":
+        # many uploaded and/or remote files
+        batch_sources = [(file.name, {"buffer": file}) for file in batch_files or []] + [
+            (line.strip(), {"url": line.strip()})
+            for line in batch_urls.splitlines()
+            if line.strip()
+        ]
     elif audio_source in (["⬆️ Upload audio file", "️🗣 Record audio️"]):
         # file is uploaded/recorded
         source = {
             "buffer": st.session_state["audio"],
         }
     else:
-        # file is local
-        source = {"buffer": open(st.session_state["audio"], "rb").read()}
+        # file is local, and is streamed from disk when transcribed
+        source = {"path": st.session_state["audio"]}
 
 # TODO: Update for v3
 # Write code
@@ -589,23 +1520,61 @@ if audio_format == "Prerecorded":
 #     # TODO: Show code for Streaming input
 #     pass
 
+# Everything up to here runs on every interaction, so keep an eye on how long it takes
+render_ms = (time.perf_counter() - _run_started) * 1000
+cold_start = _cold_start().pop("pending", False)
+render_budget_ms = COLD_START_BUDGET_MS if cold_start else RENDER_BUDGET_MS
+_get_metrics().observe(
+    "render_seconds", render_ms / 1000, view="cold_start" if cold_start else "page"
+)
+if render_ms > render_budget_ms:
+    logging.getLogger(__name__).warning(
+        "Rendering took %.0f ms, over the %.0f ms budget", render_ms, render_budget_ms
+    )
+
 if st.button(
     "🪄 Transcribe",
-    use_container_width=True,
+    width="stretch",
     type="primary",
-    disabled=not deepgram_api_key,
-    help="" if deepgram_api_key else "Enter your Deepgram API key",
+    disabled=not deepgram_api_key or recorder is not None,
+    help=(
+        "Enter your Deepgram API key"
+        if not deepgram_api_key
+        else "Recordings are transcribed as they are recorded"
+        if recorder is not None
+        else ""
+    ),
 ):
     try:
         if audio_format == "Streaming":
-            streaming(url, options)
+            if urls:
+                streaming(urls, options, chunk_size)
+            else:
+                st.warning("Enter a streaming audio URL to transcribe")
+        elif audio_source == "📚 Batch":
+            if batch_sources:
+                batch_prerecorded(batch_sources, options, max_in_flight, batch_rate)
+            else:
+                st.warning("Upload audio files or enter audio URLs to transcribe")
+        elif compare_models:
+            if len(variants) > 1:
+                compare_prerecorded(source, variants, reference_transcript)
+            else:
+                st.warning("Pick at least two models, or a model and a feature, to compare")
         else:
             prerecorded(source, options)
     except Exception as e:
-        if str(e).endswith("timed out"):
+        if is_rate_limited(e):
+            st.warning(
+                "Deepgram is rate limiting this API key, which other users may be sharing. "
+                "Please try again in a minute",
+                icon="🚦",
+            )
+        elif str(e).endswith("timed out"):
             st.error(
                 f"""{e}  
-                Please try after some time, or try with a smaller source if the issue persists.""",
+                Please try after some time, or enable "Parallel chunking" or try with a smaller source 
+                if the issue persists.""",
                 icon="⌚",
             )
         else:
@@ -618,6 +1587,28 @@ if st.button(
             )
             st.code(traceback.format_exc())
 
+if audio_format == "Streaming" and (live := st.session_state.get("live")):
+    _follow_live(live)
+elif (
+    audio_format == "Streaming"
+    and (live_id := st.query_params.get("live"))
+    and (live_log_dir := _live_log_dir(live_id))
+    and os.path.isdir(live_log_dir)
+):
+    _replay_live(live_log_dir)
+elif recorder is not None:
+    _record_live(recorder, recording_options)
+elif compare_models and (comparison := st.session_state.get("comparison")):
+    _show_comparison(comparison)
+elif (
+    audio_format == "Prerecorded"
+    and audio_source != "📚 Batch"
+    and (transcription := st.session_state.get("transcription"))
+):
+    _show_transcription(transcription)
+
+_diagnostics()
+
 st.success(
     "[Star the repo](https://github.com/SiddhantSadangi/st_deepgram_playground) to show your :heart:",
     icon="⭐",
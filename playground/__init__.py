@@ -0,0 +1 @@
+"""Helpers backing the Deepgram API Playground Streamlit app."""
@@ -0,0 +1,211 @@
+"""Headless transcription worker, running the app's prerecorded pipeline without a browser.
+
+    python -m playground [AUDIO ...] [--queue FILE] [--output results.jsonl]
+                         [--model Nova-2] [--language English] [--no-summarize ...]
+                         [--max-in-flight 4] [--rate 2] [--compress flac] [--chunk-minutes 5]
+
+AUDIO is any mix of audio files, directories (searched for audio files) and URLs. With
+`--queue`, more are read one per line from a file, or `-` for stdin, and taken as they
+arrive, so a job runner can keep feeding the worker. Requests go through the same
+transcript cache, near-duplicate index and per-key scheduler as the app, configured with
+the same `DEEPGRAM_PLAYGROUND_*` environment variables, and features default to what the
+app asks for. Each result is written as one line of JSON as soon as it finishes. The API
+key is read from the `DEEPGRAM_API_KEY` environment variable.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+from playground.batch import BatchResult, BatchTranscriber
+from playground.metrics import Metrics
+from playground.pipeline import (
+    AUTO_LANGUAGE,
+    BATCH_MAX_IN_FLIGHT,
+    LANGUAGES,
+    MODELS,
+    audio_files,
+    deepgram_client,
+    fingerprint_index,
+    prepare_source,
+    prerecorded_options,
+    transcript_cache,
+)
+from playground.results import parse_response
+from playground.transcribe import Transcription, source_digest, transcribe
+
+# Feature flags, and whether the app turns them on for prerecorded audio by default
+FEATURES = {
+    "detect_entities": True,
+    "detect_topics": True,
+    "diarize": True,
+    "multichannel": False,
+    "paragraphs": True,
+    "profanity_filter": False,
+    "punctuate": False,
+    "smart_format": True,
+    "summarize": True,
+    "utterances": True,
+}
+
+
+def _targets(audio: List[str], queue: Optional[TextIO]) -> Iterator[str]:
+    for target in audio:
+        if os.path.isdir(target):
+            yield from audio_files(target)
+        else:
+            yield target
+    if queue is not None:
+        for line in queue:
+            if (target := line.strip()) and not target.startswith("#"):
+                yield target
+
+
+def _record(result: BatchResult, traces: Dict[str, Any], full: bool) -> Dict[str, Any]:
+    """What the worker reports for one source, as a JSON object"""
+    record: Dict[str, Any] = {
+        "source": result.name,
+        "status": "failed" if result.error else "cached" if result.cached else "done",
+        "attempts": result.attempts,
+        "seconds": round(result.elapsed, 3),
+    }
+    if trace := traces.pop(result.name, None):
+        record["stages"] = trace.to_dict()["stages"]
+    if result.error:
+        record["error"] = f"{type(result.error).__name__}: {result.error}"
+        return record
+
+    metadata = result.response.get("metadata", {})
+    record["request_id"] = metadata.get("request_id")
+    record["duration"] = metadata.get("duration")
+    try:
+        record["channels"] = [
+            {
+                "transcript": channel.transcript,
+                "detected_language": channel.detected_language,
+                "summaries": channel.summaries,
+            }
+            for channel in parse_response(result.response).channels
+        ]
+    except (KeyError, IndexError, TypeError) as e:
+        record["error"] = f"Unexpected response: {e!r}"
+    if full:
+        record["response"] = result.response
+    return record
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m playground", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("audio", nargs="*", help="Audio files, directories of them, or URLs")
+    parser.add_argument(
+        "--queue",
+        type=argparse.FileType("r", encoding="UTF-8"),
+        help="File listing more audio, one per line, or - for stdin",
+    )
+    parser.add_argument("--output", help="Write results to this file instead of stdout")
+    parser.add_argument("--full-response", action="store_true", help="Include raw responses")
+    parser.add_argument("--metrics", help="Write OpenMetrics text to this file when done")
+    parser.add_argument("--model", choices=list(MODELS), default=next(iter(MODELS)))
+    parser.add_argument("--language", choices=list(LANGUAGES), default=AUTO_LANGUAGE)
+    for feature, default in FEATURES.items():
+        parser.add_argument(
+            f"--{feature.replace('_', '-')}",
+            action=argparse.BooleanOptionalAction,
+            default=default,
+        )
+    parser.add_argument("--utt-split", type=float, default=0.8)
+    parser.add_argument("--redact", nargs="+", choices=["numbers", "pci", "ssn"], default=[])
+    parser.add_argument("--search", nargs="+", default=[], help="Terms to search the audio for")
+    parser.add_argument("--max-in-flight", type=int, default=BATCH_MAX_IN_FLIGHT)
+    parser.add_argument("--rate", type=float, help="Most requests to start per second")
+    parser.add_argument(
+        "--compress",
+        choices=["flac", "opus"],
+        help="Downmix, resample and compress local audio before upload",
+    )
+    parser.add_argument(
+        "--chunk-minutes",
+        type=float,
+        help="Split long local audio at silences into chunks about this long, sent in parallel",
+    )
+    parser.add_argument("--url", default="", help="Deepgram API base URL, if not the hosted one")
+    args = parser.parse_args(argv)
+
+    if not args.audio and args.queue is None:
+        parser.error("Give audio to transcribe, or a --queue to read it from")
+    if not (api_key := os.getenv("DEEPGRAM_API_KEY")):
+        parser.error("Set the DEEPGRAM_API_KEY environment variable")
+
+    deepgram = deepgram_client(api_key, args.url)
+    cache = transcript_cache()
+    fingerprints = fingerprint_index()
+    if fingerprints is not None:
+        from playground.fingerprint import prune
+
+        prune(fingerprints, cache)
+    metrics = Metrics()
+    options = prerecorded_options(
+        args.model,
+        args.language,
+        args.redact,
+        ", ".join(args.search),
+        **{feature: getattr(args, feature) for feature in FEATURES},
+        utt_split=args.utt_split,
+    )
+    traces: Dict[str, Any] = {}
+
+    def transcribe_target(target: str) -> Transcription:
+        with metrics.trace("worker", target) as trace:
+            traces[target] = trace
+            source = prepare_source(target)
+            transcription = transcribe(
+                deepgram,
+                source,
+                options,
+                cache,
+                source_digest(source, cache),
+                preprocess=args.compress,
+                chunk_seconds=args.chunk_minutes and args.chunk_minutes * 60,
+                max_in_flight=args.max_in_flight,
+                fingerprints=fingerprints,
+            )
+            trace.cached = transcription.cached
+            trace.audio_seconds = transcription.response.get("metadata", {}).get("duration")
+        return transcription
+
+    batch = BatchTranscriber(
+        transcribe_target, max_in_flight=args.max_in_flight, rate=args.rate or None
+    )
+    output = open(args.output, "w", encoding="UTF-8") if args.output else sys.stdout
+    started = time.perf_counter()
+    counts = {"done": 0, "cached": 0, "failed": 0}
+    try:
+        targets = _targets(args.audio, args.queue)
+        for result in batch.run((target, target) for target in targets):
+            record = _record(result, traces, args.full_response)
+            counts[record["status"]] += 1
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        deepgram.transport.shutdown()
+
+    if args.metrics:
+        with open(args.metrics, "w", encoding="UTF-8") as f:
+            f.write(metrics.openmetrics())
+    print(
+        f"{counts['done']} transcribed, {counts['cached']} cached, {counts['failed']} failed "
+        f"in {time.perf_counter() - started:.1f} s",
+        file=sys.stderr,
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
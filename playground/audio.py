@@ -0,0 +1,141 @@
+"""Client-side audio preprocessing: downmix, resample and compress before upload."""
+
+import contextlib
+import os
+import tempfile
+from typing import BinaryIO, Iterator, Optional
+
+import numpy as np
+import soundfile as sf
+
+TARGET_SAMPLE_RATE = 16000
+BLOCK_SECONDS = 10
+# Rates Opus encodes at, up to the target
+OPUS_SAMPLE_RATES = (8000, 12000, 16000)
+
+# Deepgram `encoding` -> (libsndfile container, subtype)
+CODECS = {
+    "flac": ("FLAC", "PCM_16"),
+    "opus": ("OGG", "OPUS"),
+}
+
+
+def probe(audio: BinaryIO) -> Optional[sf._SoundFileInfo]:
+    """Header of `audio` if libsndfile can decode it, leaving the stream position unchanged."""
+    position = audio.tell()
+    try:
+        return sf.info(audio)
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        return None
+    finally:
+        audio.seek(position)
+
+
+def target_sample_rate(codec: str, rate: int) -> int:
+    """Rate to re-encode audio recorded at `rate` at, which is never above the source rate"""
+    rate = min(rate, TARGET_SAMPLE_RATE)
+    if codec == "opus":
+        return next(supported for supported in OPUS_SAMPLE_RATES if supported >= rate)
+    return rate
+
+
+def stream_size(stream: BinaryIO) -> int:
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size
+
+
+def lowpass_filter(cutoff: float, taps: int = 129) -> np.ndarray:
+    """Hann-windowed sinc low-pass FIR, with `cutoff` as a fraction of the sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hanning(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+class Resampler:
+    """Streaming resampler for `(frames, channels)` blocks.
+
+    Downsampling is anti-aliased with a FIR low-pass, then samples are linearly
+    interpolated at the output rate. Filter history and the fractional read position are
+    carried between blocks, so block boundaries don't introduce discontinuities.
+    """
+
+    def __init__(self, rate: int, target_rate: int, channels: int):
+        self.step = rate / target_rate
+        self.kernel = (
+            lowpass_filter(0.45 / self.step) if self.step > 1 else np.ones(1, dtype=np.float32)
+        )
+        self.history = np.zeros((len(self.kernel) - 1, channels), dtype=np.float32)
+        self.last = np.zeros((1, channels), dtype=np.float32)
+        self.position = 0.0  # next output sample, in input samples relative to `last`
+        self.consumed = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        if self.step == 1:
+            return block
+
+        padded = np.concatenate([self.history, block])
+        self.history = padded[len(padded) - len(self.history) :]
+        filtered = np.stack(
+            [np.convolve(padded[:, c], self.kernel, mode="valid") for c in range(block.shape[1])],
+            axis=1,
+        )
+
+        # `samples[0]` is the last filtered sample of the previous block, at index -1
+        samples = np.concatenate([self.last, filtered])
+        self.last = samples[-1:]
+        positions = np.arange(self.position, len(block) - 1, self.step)
+        if len(positions):
+            self.position = positions[-1] + self.step
+        self.position -= len(block)
+        grid = np.arange(-1, len(block))
+        return np.stack(
+            [np.interp(positions, grid, samples[:, c]) for c in range(block.shape[1])], axis=1
+        ).astype(np.float32)
+
+
+def encode(
+    reader: sf.SoundFile,
+    output: BinaryIO,
+    codec: str,
+    mono: bool,
+    sample_rate: int,
+    start: int = 0,
+    frames: int = -1,
+) -> None:
+    """Re-encode `frames` frames of `reader` from `start`, block by block, into `output`."""
+    container, subtype = CODECS[codec]
+    channels = 1 if mono else reader.channels
+    resampler = Resampler(reader.samplerate, sample_rate, channels)
+    reader.seek(start)
+    with sf.SoundFile(
+        output, "w", samplerate=sample_rate, channels=channels, format=container, subtype=subtype
+    ) as writer:
+        for block in reader.blocks(
+            blocksize=reader.samplerate * BLOCK_SECONDS,
+            frames=frames,
+            dtype="float32",
+            always_2d=True,
+        ):
+            if mono:
+                block = block.mean(axis=1, keepdims=True)
+            writer.write(resampler.process(block))
+
+
+@contextlib.contextmanager
+def preprocessed(
+    audio: BinaryIO,
+    codec: str = "flac",
+    mono: bool = True,
+    sample_rate: int = TARGET_SAMPLE_RATE,
+) -> Iterator[BinaryIO]:
+    """Re-encode `audio` into a temporary file and yield it rewound.
+
+    The temporary file is deleted when the context exits.
+    """
+    audio.seek(0)
+    with sf.SoundFile(audio) as reader, tempfile.TemporaryFile() as output:
+        encode(reader, output, codec, mono, sample_rate)
+        output.seek(0)
+        yield output
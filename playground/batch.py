@@ -0,0 +1,112 @@
+"""Bounded-concurrency batch runner for prerecorded transcriptions."""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import httpx
+from deepgram import DeepgramApiError, DeepgramUnknownApiError
+
+# 429s are left to the API key's `Scheduler`, which pauses every request on the key and
+# queues the one turned away again, so they aren't retried on top of that here
+RETRYABLE_STATUSES = {408, 500, 502, 503, 504}
+
+
+@dataclass
+class BatchResult:
+    name: str
+    response: Optional[Dict[str, Any]] = None
+    error: Optional[Exception] = None
+    cached: bool = False
+    attempts: int = 0
+    elapsed: float = 0.0
+
+
+class RateLimiter:
+    """Spaces out calls so no more than `rate` start per second, across all threads."""
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (DeepgramApiError, DeepgramUnknownApiError)):
+        try:
+            return int(error.status) in RETRYABLE_STATUSES
+        except (TypeError, ValueError):
+            return False
+    return isinstance(error, (httpx.TimeoutException, httpx.NetworkError))
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff for the given (1-based) attempt."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class BatchTranscriber:
+    """Runs `transcribe(source)` over many sources with bounded concurrency.
+
+    `transcribe` returns `(response, cached, ...)`. Retryable failures (5xx, timeouts,
+    network errors) are retried with jittered exponential backoff. Results are yielded
+    as soon as each source finishes, in completion order.
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[dict], Tuple[Any, ...]],
+        max_in_flight: int = 4,
+        rate: Optional[float] = None,
+        max_attempts: int = 4,
+    ):
+        self.transcribe = transcribe
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = RateLimiter(rate)
+        self.max_attempts = max_attempts
+
+    def _run_one(self, name: str, source: dict) -> BatchResult:
+        result = BatchResult(name)
+        start = time.perf_counter()
+        while True:
+            result.attempts += 1
+            self.rate_limiter.wait()
+            try:
+                result.response, result.cached, *_ = self.transcribe(source)
+                break
+            except Exception as e:
+                if result.attempts >= self.max_attempts or not is_retryable(e):
+                    result.error = e
+                    break
+                time.sleep(backoff_delay(result.attempts))
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def run(self, sources: Iterable[Tuple[str, dict]]) -> Iterator[BatchResult]:
+        executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        # Sources are taken only as workers free up, so they can be a queue still being filled
+        pending = set()
+        try:
+            for name, source in sources:
+                pending.add(executor.submit(self._run_one, name, source))
+                if len(pending) >= self.max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in as_completed(pending):
+                yield future.result()
+        finally:
+            # Don't hold up a Streamlit rerun on requests nobody is waiting for anymore
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,297 @@
+"""Offline benchmarks of the transcription paths, against a local mock Deepgram server.
+
+    python -m playground.bench [--scenarios sample batch large live] [--json results.json]
+                               [--compare baseline.json] [--tolerance 0.25]
+
+Each scenario drives the same functions the app uses (`transcribe`, `BatchTranscriber`,
+`LiveTranscriber`) in a fresh process, so its peak RSS is its own, and reports throughput
+and p50/p99 latency. Prerecorded latency is the time per request; live latency is the time
+to send each audio chunk. With `--compare`, the run fails if any scenario's throughput
+drops, or its p99 latency or peak RSS grows, by more than `--tolerance`.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import wave
+from array import array
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from playground.mockserver import BYTES_PER_SECOND, SAMPLE_RATE, MockDeepgram
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "sample_file.wav")
+
+
+class Run(NamedTuple):
+    """What a scenario measured, for `report` to summarize"""
+
+    requests: int
+    seconds: float
+    audio_seconds: float
+    bytes_sent: int
+    latencies: List[float]
+
+
+def write_wav(path: str, seconds: float) -> str:
+    """A mono 16 kHz linear16 WAV file of a quiet tone"""
+    second = array(
+        "h", (int(800 * math.sin(2 * math.pi * 440 * i / SAMPLE_RATE)) for i in range(SAMPLE_RATE))
+    )
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        whole, part = divmod(int(seconds * SAMPLE_RATE), SAMPLE_RATE)
+        for _ in range(whole):
+            f.writeframes(second)
+        f.writeframes(second[:part])
+    return path
+
+
+def _transcribe_files(urls: Dict[str, str], paths: List[str], max_in_flight: int = 1) -> Run:
+    from deepgram import PrerecordedOptions
+
+    from playground.batch import BatchTranscriber
+    from playground.cache import TranscriptCache
+    from playground.client import PooledDeepgramClient
+    from playground.metrics import Metrics
+    from playground.transcribe import transcribe
+
+    deepgram = PooledDeepgramClient("mock", url=urls["http"])
+    options = PrerecordedOptions(model="nova-2", smart_format=True)
+    metrics = Metrics(max_traces=len(paths))
+
+    requests = itertools.count()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        transcript_cache = TranscriptCache(cache_dir, max_bytes=1 << 30, ttl=3600)
+
+        def transcribe_one(source: dict):
+            with metrics.trace("bench", source["path"]) as trace:
+                # Salted with the request number so repeated files miss the cache too
+                digest = f"{transcript_cache.hash_file(source['path'])}:{next(requests)}"
+                result = transcribe(deepgram, source, options, transcript_cache, digest)
+                trace.audio_seconds = result.response["metadata"]["duration"]
+                return result
+
+        started = time.perf_counter()
+        batch = BatchTranscriber(transcribe_one, max_in_flight=max_in_flight, max_attempts=1)
+        for result in batch.run((path, {"path": path}) for path in paths):
+            if result.error:
+                raise result.error
+        seconds = time.perf_counter() - started
+    deepgram.transport.shutdown()
+
+    traces = list(metrics.traces)
+    return Run(
+        len(traces),
+        seconds,
+        sum(trace.audio_seconds or 0 for trace in traces),
+        sum(trace.bytes_sent for trace in traces),
+        [trace.stages["total"] for trace in traces],
+    )
+
+
+def sample(urls: Dict[str, str], workdir: str, scale: float) -> Run:
+    """The bundled sample file, one request at a time"""
+    return _transcribe_files(urls, [SAMPLE_FILE] * max(1, int(10 * scale)))
+
+
+def batch(urls: Dict[str, str], workdir: str, scale: float) -> Run:
+    """Many small files, transcribed concurrently as the app's batch mode does"""
+    paths = [
+        write_wav(os.path.join(workdir, f"small_{i}.wav"), 5 + i % 10)
+        for i in range(max(1, int(200 * scale)))
+    ]
+    return _transcribe_files(urls, paths, max_in_flight=8)
+
+
+def large(urls: Dict[str, str], workdir: str, scale: float) -> Run:
+    """A single long recording"""
+    path = write_wav(os.path.join(workdir, "large.wav"), max(60, 3600 * scale))
+    return _transcribe_files(urls, [path] * 3)
+
+
+def live(urls: Dict[str, str], workdir: str, scale: float) -> Run:
+    """A long live stream, read from the mock server at 30x real time"""
+    from deepgram import DeepgramClient, DeepgramClientOptions, LiveOptions
+
+    from playground.live import LiveTranscriber
+    from playground.metrics import Metrics
+
+    class Recorder(Metrics):
+        def __init__(self):
+            super().__init__()
+            self.samples: Dict[str, List[float]] = {}
+
+        def observe(self, name: str, value: float, **labels: str) -> None:
+            super().observe(name, value, **labels)
+            self.samples.setdefault(name, []).append(value)
+
+    seconds = max(60, 1800 * scale)
+    metrics = Recorder()
+    transcriber = LiveTranscriber(
+        DeepgramClient("mock", DeepgramClientOptions(url=urls["ws"])),
+        [f"{urls['http']}/audio?seconds={seconds}&speed=30"],
+        LiveOptions(model="nova-2", encoding="linear16", sample_rate=SAMPLE_RATE),
+        metrics=metrics,
+    )
+    started = time.perf_counter()
+    transcriber.start().join()
+    elapsed = time.perf_counter() - started
+    feed = transcriber.feeds[0]
+    if transcriber.error or feed.status != "finished":
+        raise RuntimeError(f"Live stream {feed.status}: {transcriber.error or feed.error}")
+    latencies = metrics.samples.get("live_chunk_send_seconds", [])
+    return Run(
+        len(latencies), elapsed, feed.bytes_sent / BYTES_PER_SECOND, feed.bytes_sent, latencies
+    )
+
+
+SCENARIOS: Dict[str, Callable[[Dict[str, str], str, float], Run]] = {
+    "sample": sample,
+    "batch": batch,
+    "large": large,
+    "live": live,
+}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, math.ceil(q * len(values)) - 1)]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def report(name: str, run: Run, peak_rss_mb: float) -> Dict[str, Any]:
+    return {
+        "scenario": name,
+        "requests": run.requests,
+        "seconds": round(run.seconds, 3),
+        "requests_per_second": round(run.requests / run.seconds, 2),
+        "audio_seconds_per_second": round(run.audio_seconds / run.seconds, 1),
+        "mb_per_second": round(run.bytes_sent / run.seconds / 1024 / 1024, 2),
+        "p50_ms": round(_percentile(run.latencies, 0.5) * 1000, 2),
+        "p99_ms": round(_percentile(run.latencies, 0.99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+
+def _run_scenario(name: str, urls: Dict[str, str], scale: float, results) -> None:
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            run = SCENARIOS[name](urls, workdir, scale)
+        results.put(report(name, run, _peak_rss_mb()))
+    except Exception as e:
+        results.put({"scenario": name, "error": f"{type(e).__name__}: {e}"})
+
+
+def run_scenarios(names: List[str], mock: MockDeepgram, scale: float = 1.0) -> List[Dict[str, Any]]:
+    """Run each scenario in its own process against `mock`, returning one report per scenario"""
+    context = multiprocessing.get_context("spawn")
+    urls = {"http": mock.http_url, "ws": mock.ws_url}
+    reports = []
+    for name in names:
+        results = context.Queue()
+        process = context.Process(target=_run_scenario, args=(name, urls, scale, results))
+        process.start()
+        reports.append(results.get())
+        process.join()
+    return reports
+
+
+def regressions(
+    reports: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float
+) -> List[str]:
+    """Descriptions of every metric that got worse than `baseline` by more than `tolerance`"""
+    previous = {entry["scenario"]: entry for entry in baseline}
+    found = []
+    for entry in reports:
+        if entry["scenario"] not in previous or "error" in entry:
+            continue
+        before = previous[entry["scenario"]]
+        for metric, higher_is_better in (
+            ("audio_seconds_per_second", True),
+            ("p99_ms", False),
+            ("peak_rss_mb", False),
+        ):
+            old, new = before.get(metric), entry[metric]
+            if not old or math.isnan(new):
+                continue
+            change = (new - old) / old * (-1 if higher_is_better else 1)
+            if change > tolerance:
+                found.append(f"{entry['scenario']}: {metric} {old} -> {new} ({change:+.0%} worse)")
+    return found
+
+
+def _print_table(reports: List[Dict[str, Any]]) -> None:
+    columns = [
+        "scenario",
+        "requests",
+        "seconds",
+        "requests_per_second",
+        "audio_seconds_per_second",
+        "mb_per_second",
+        "p50_ms",
+        "p99_ms",
+        "peak_rss_mb",
+    ]
+    rows = [[str(entry.get(column, "")) for column in columns] for entry in reports]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    for row in [columns, *rows]:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+    for entry in reports:
+        if "error" in entry:
+            print(f"{entry['scenario']} failed: {entry['error']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m playground.bench", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for workload sizes")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock response latency (s)")
+    parser.add_argument(
+        "--processing-factor",
+        type=float,
+        default=0.001,
+        help="Mock processing time per second of prerecorded audio (s)",
+    )
+    parser.add_argument("--json", help="Write the reports to this file")
+    parser.add_argument("--compare", help="Reports of a previous run (--json) to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    with MockDeepgram(latency=args.latency, processing_factor=args.processing_factor) as mock:
+        reports = run_scenarios(args.scenarios, mock, args.scale)
+    _print_table(reports)
+
+    if args.json:
+        with open(args.json, "w", encoding="UTF-8") as f:
+            json.dump(reports, f, indent=2)
+    failed = any("error" in entry for entry in reports)
+    if args.compare:
+        with open(args.compare, "r", encoding="UTF-8") as f:
+            found = regressions(reports, json.load(f), args.tolerance)
+        for regression in found:
+            print(f"Regression: {regression}")
+        failed = failed or bool(found)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""Persistent, content-addressed cache for prerecorded transcripts.
+
+Responses are stored as JSON files named after a SHA-256 of the audio and the request
+options, with a small SQLite index tracking size, age and last access for TTL and LRU
+eviction. The store is shared by every session (and every replica mounting the same
+directory), and survives process restarts.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+CHUNK_SIZE = 1024 * 1024
+MAX_FILE_DIGESTS = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+DROP TABLE IF EXISTS file_hashes;
+CREATE TABLE IF NOT EXISTS file_digests (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS file_digests_used ON file_digests (used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+
+def hash_audio(audio) -> str:
+    """SHA-256 of raw bytes or a seekable file-like object, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        digest.update(audio)
+        return digest.hexdigest()
+
+    position = audio.tell()
+    audio.seek(0)
+    try:
+        for chunk in iter(lambda: audio.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    finally:
+        audio.seek(position)
+    return digest.hexdigest()
+
+
+def normalize_options(options) -> Dict[str, Any]:
+    """Request options, an options object or a dict, with equivalent settings spelled the same way.
+
+    Disabled features, empty lists and an empty `search` are dropped, since Deepgram treats
+    them as unset. `smart_format` implies `punctuate` and `paragraphs`, `utt_split` only
+    matters with `utterances`, and the order of `redact` entities doesn't matter.
+    """
+    if hasattr(options, "to_dict"):
+        options = options.to_dict()
+    options = dict(options)
+    if options.get("smart_format"):
+        options.update(punctuate=True, paragraphs=True)
+    if not options.get("utterances"):
+        options.pop("utt_split", None)
+    if isinstance(options.get("search"), str) and not options["search"].strip("[] "):
+        options.pop("search")
+    if isinstance(options.get("redact"), list):
+        options["redact"] = sorted(set(options["redact"]))
+    return {
+        key: value
+        for key, value in options.items()
+        if value is not None and value is not False and value != [] and value != ""
+    }
+
+
+def hash_options(options) -> str:
+    """Canonical SHA-256 of request options, the same for options that give the same result.
+
+    Options objects and plain dicts of options are normalized alike.
+    """
+    options = normalize_options(options)
+    canonical = json.dumps(options, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def cache_key(audio_digest: str, options) -> str:
+    return hashlib.sha256(f"{audio_digest}:{hash_options(options)}".encode()).hexdigest()
+
+
+class TranscriptCache:
+    """Size-bounded LRU store of transcription responses with a time-to-live."""
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _count(self, conn: sqlite3.Connection, name: str, value: int = 1) -> None:
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (value, name))
+
+    def _delete(self, conn: sqlite3.Connection, key: str) -> None:
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(key))
+
+    def hash_file(self, path: str) -> str:
+        """Digest of a local file, memoized on its path, size and modification time.
+
+        Digests unused for the TTL, and the least recently used beyond `MAX_FILE_DIGESTS`,
+        are forgotten along with evicted transcripts.
+        """
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT digest FROM file_digests WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE file_digests SET used = ? WHERE path = ?", (time.time(), path))
+                return row[0]
+
+        with open(path, "rb") as f:
+            digest = hash_audio(f)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_digests VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest, time.time()),
+            )
+        return digest
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and now - row[0] > self.ttl:
+                self._delete(conn, key)
+                row = None
+            if row:
+                try:
+                    with open(self._path(key), "r", encoding="UTF-8") as f:
+                        response = json.load(f)
+                except (OSError, ValueError):
+                    self._delete(conn, key)
+                else:
+                    conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                    self._count(conn, "hits")
+                    return response
+            if count_miss:
+                self._count(conn, "misses")
+        return None
+
+    def keys(self) -> List[str]:
+        with self._connect() as conn:
+            return [key for (key,) in conn.execute("SELECT key FROM entries")]
+
+    def path(self, key: str) -> Optional[str]:
+        """Location of a cached response on disk, if present."""
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
+
+    def put(self, key: str, response: Dict[str, Any]) -> List[str]:
+        """Store `response` under `key`. Returns the keys evicted by it, expired ones included."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="UTF-8") as f:
+                json.dump(response, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, os.path.getsize(path), now, now),
+            )
+            return self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> List[str]:
+        evicted = [
+            key
+            for (key,) in conn.execute(
+                "SELECT key FROM entries WHERE created < ?", (now - self.ttl,)
+            ).fetchall()
+        ]
+        for key in evicted:
+            self._delete(conn, key)
+
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total > self.max_bytes:
+            for key, size in conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._delete(conn, key)
+                total -= size
+                evicted.append(key)
+        if evicted:
+            self._count(conn, "evictions", len(evicted))
+
+        conn.execute("DELETE FROM file_digests WHERE used < ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM file_digests WHERE path NOT IN "
+            "(SELECT path FROM file_digests ORDER BY used DESC LIMIT ?)",
+            (MAX_FILE_DIGESTS,),
+        )
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            stats = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            stats["entries"], stats["bytes"] = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            (stats["file_digests"],) = conn.execute("SELECT COUNT(*) FROM file_digests").fetchone()
+        return stats
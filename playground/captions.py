@@ -0,0 +1,119 @@
+"""WebVTT and SRT captions built from word timings, one cue at a time.
+
+Words are grouped into cues in a single pass: a cue ends when its next word would
+overflow `max_lines` lines of `max_chars` characters, run past `max_duration` seconds,
+follow a pause longer than `max_gap` seconds, or come from another speaker. Everything
+here is a generator, so captions for long recordings are written out as they are made.
+"""
+
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from playground.results import Word
+
+MAX_CHARS = 42
+MAX_LINES = 2
+MAX_DURATION = 7.0
+MAX_GAP = 1.5
+
+
+class Cue(NamedTuple):
+    start: float
+    end: float
+    text: str
+    speaker: Optional[int] = None
+
+
+class CaptionBuilder:
+    """Incrementally groups words into cues.
+
+    `add` yields the cues completed by the words given, and `flush` the cue in progress,
+    so the same builder serves whole responses and live results as they come in.
+    """
+
+    def __init__(
+        self,
+        max_chars: int = MAX_CHARS,
+        max_lines: int = MAX_LINES,
+        max_duration: float = MAX_DURATION,
+        max_gap: float = MAX_GAP,
+    ):
+        self.max_chars = max_chars
+        self.max_lines = max_lines
+        self.max_duration = max_duration
+        self.max_gap = max_gap
+        self._lines: List[str] = []
+        self._line: List[str] = []
+        self._line_length = 0
+        self._start: Optional[float] = None
+        self._end = 0.0
+        self._speaker: Optional[int] = None
+
+    def add(self, words: Iterable[Word]) -> Iterator[Cue]:
+        for word in words:
+            text, speaker = word.text, word.speaker
+            if self._start is not None and (
+                speaker != self._speaker
+                or word.end - self._start > self.max_duration
+                or word.start - self._end > self.max_gap
+            ):
+                yield self._cue()
+
+            if self._line and self._line_length + 1 + len(text) > self.max_chars:
+                if len(self._lines) + 1 >= self.max_lines:
+                    yield self._cue()
+                else:
+                    self._lines.append(" ".join(self._line))
+                    self._line, self._line_length = [], 0
+
+            if self._start is None:
+                self._start, self._speaker = word.start, speaker
+            self._line_length += len(text) + bool(self._line)
+            self._line.append(text)
+            self._end = word.end
+
+    def flush(self) -> Iterator[Cue]:
+        if self._start is not None:
+            yield self._cue()
+
+    def _cue(self) -> Cue:
+        cue = Cue(
+            self._start, self._end, "\n".join(self._lines + [" ".join(self._line)]), self._speaker
+        )
+        self._lines, self._line, self._line_length = [], [], 0
+        self._start, self._speaker = None, None
+        return cue
+
+
+def cues(words: Iterable[Word], **limits) -> Iterator[Cue]:
+    """Cues for `words`, with `CaptionBuilder` `limits`."""
+    builder = CaptionBuilder(**limits)
+    yield from builder.add(words)
+    yield from builder.flush()
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def webvtt(cues: Iterable[Cue], speaker_labels: bool = True) -> Iterator[str]:
+    yield "WEBVTT\n\n"
+    for cue in cues:
+        text = cue.text
+        if speaker_labels and cue.speaker is not None:
+            text = f"<v Speaker {cue.speaker}>{text}"
+        yield f"{_timestamp(cue.start, '.')} --> {_timestamp(cue.end, '.')}\n{text}\n\n"
+
+
+def srt(cues: Iterable[Cue], speaker_labels: bool = True) -> Iterator[str]:
+    for number, cue in enumerate(cues, start=1):
+        text = cue.text
+        if speaker_labels and cue.speaker is not None:
+            text = f"[Speaker {cue.speaker}] {text}"
+        yield f"{number}\n{_timestamp(cue.start, ',')} --> {_timestamp(cue.end, ',')}\n{text}\n\n"
+
+
+FORMATS = {"WebVTT": (webvtt, "vtt", "text/vtt"), "SRT": (srt, "srt", "application/x-subrip")}
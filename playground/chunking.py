@@ -0,0 +1,265 @@
+"""Split long audio at silences, transcribe the chunks in parallel and stitch the results.
+
+Chunks are cut at the quietest frame near each target boundary, using a frame-energy
+voice activity measure, and each chunk after the first starts `overlap` seconds before
+its boundary. Words in that overlap are transcribed twice: they are dropped from the
+later chunk, but are first used to match its diarization speaker labels to the labels
+already assigned, so speakers stay consistent across the whole recording.
+"""
+
+import contextlib
+import copy
+import dataclasses
+import math
+import tempfile
+from collections import Counter
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+from deepgram import PrerecordedOptions
+
+from playground.audio import encode
+from playground.batch import BatchTranscriber
+from playground.client import PooledDeepgramClient
+from playground.metrics import attach, current_trace, stage
+from playground.scheduler import current_session, session
+
+FRAME_SECONDS = 0.03
+SEARCH_SECONDS = 30
+OVERLAP_SECONDS = 5
+MATCH_TOLERANCE = 0.3
+
+
+def frame_energy(reader: sf.SoundFile, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """RMS energy of consecutive mono frames, computed block by block."""
+    frame = max(1, int(reader.samplerate * frame_seconds))
+    reader.seek(0)
+    energies = []
+    # Blocks hold whole frames but the last, whose partial frame is left out rather than padded
+    for block in reader.blocks(blocksize=frame * 1000, dtype="float32", always_2d=True):
+        mono = block.mean(axis=1)
+        frames = mono[: len(mono) // frame * frame].reshape(-1, frame)
+        energies.append(np.sqrt(np.mean(frames**2, axis=1)))
+    return np.concatenate(energies) if energies else np.zeros(0)
+
+
+def split_points(
+    energy: np.ndarray,
+    chunk_seconds: float,
+    frame_seconds: float = FRAME_SECONDS,
+    search_seconds: float = SEARCH_SECONDS,
+) -> List[float]:
+    """Times (in seconds) of the quietest frame within `search_seconds` of each boundary.
+
+    The last chunk is left at least a quarter of `chunk_seconds` of its own audio.
+    """
+    duration = len(energy) * frame_seconds
+    search = min(search_seconds, chunk_seconds / 4)
+    last = int((duration - chunk_seconds / 4) / frame_seconds)
+    points = []
+    target = chunk_seconds
+    while target < duration - chunk_seconds / 4:
+        lo = int((target - search) / frame_seconds)
+        hi = max(lo + 1, min(int((target + search) / frame_seconds), last))
+        points.append((lo + int(np.argmin(energy[lo:hi]))) * frame_seconds)
+        target = points[-1] + chunk_seconds
+    return points
+
+
+def _shift(item: Dict[str, Any], offset: float) -> Dict[str, Any]:
+    item = dict(item)
+    for field in ("start", "end"):
+        if field in item:
+            item[field] += offset
+    return item
+
+
+def _match_speakers(
+    overlap_words: List[Dict[str, Any]], merged_words: List[Dict[str, Any]]
+) -> Dict[int, int]:
+    """Map a chunk's speaker labels onto global ones, by agreement on the overlapping words."""
+    votes: Counter = Counter()
+    for word in overlap_words:
+        for other in reversed(merged_words):
+            if other["start"] < word["start"] - MATCH_TOLERANCE:
+                break
+            if (
+                abs(other["start"] - word["start"]) <= MATCH_TOLERANCE
+                and other["word"] == word["word"]
+                and "speaker" in word
+            ):
+                votes[word["speaker"], other["speaker"]] += 1
+                break
+
+    mapping: Dict[int, int] = {}
+    for (local, global_), _ in votes.most_common():
+        if local not in mapping and global_ not in mapping.values():
+            mapping[local] = global_
+    return mapping
+
+
+def _speaker(mapping: Dict[int, int], speaker: int, state: Dict[str, int]) -> int:
+    """Global label for a chunk's speaker, allocating a new one for speakers not yet seen"""
+    if speaker not in mapping:
+        mapping[speaker] = state["next"]
+        state["next"] += 1
+    return mapping[speaker]
+
+
+def _paragraphs_transcript(paragraphs: List[Dict[str, Any]]) -> str:
+    return "".join(
+        "\n"
+        + (f"Speaker {paragraph['speaker']}: " if "speaker" in paragraph else "")
+        + " ".join(sentence["text"] for sentence in paragraph["sentences"])
+        + "\n"
+        for paragraph in paragraphs
+    )
+
+
+def merge_responses(
+    responses: List[Dict[str, Any]], offsets: List[float], bounds: List[float]
+) -> Dict[str, Any]:
+    """Stitch chunk responses into one, as if the whole recording had been sent at once.
+
+    Chunk `i` starts at `offsets[i]` seconds and contributes results starting within
+    `[bounds[i], bounds[i + 1])`. Word, sentence, paragraph and utterance timestamps are
+    shifted onto the recording's timeline. List-valued features without timestamps
+    (summaries, topics, entities) are concatenated.
+    """
+    merged = copy.deepcopy(responses[0])
+    channels = merged["results"]["channels"]
+    speaker_state = [{"next": 0} for _ in channels]
+    words: List[List[Dict[str, Any]]] = [[] for _ in channels]
+    paragraphs: List[List[Dict[str, Any]]] = [[] for _ in channels]
+    extras: List[Dict[str, list]] = [{} for _ in channels]
+    confidence = [[0.0, 0] for _ in channels]
+    utterances = []
+
+    for i, (response, offset) in enumerate(zip(responses, offsets)):
+        lo, hi = bounds[i], bounds[i + 1]
+        mappings = []
+        for c, channel in enumerate(response["results"]["channels"]):
+            alternative = channel["alternatives"][0]
+            chunk_words = [_shift(word, offset) for word in alternative.get("words", [])]
+
+            mapping = _match_speakers(
+                [word for word in chunk_words if word["start"] < lo], words[c]
+            )
+            mappings.append(mapping)
+            for word in chunk_words:
+                if lo <= word["start"] < hi:
+                    if "speaker" in word:
+                        word["speaker"] = _speaker(mapping, word["speaker"], speaker_state[c])
+                    words[c].append(word)
+                    confidence[c][0] += word.get("confidence", 0)
+                    confidence[c][1] += 1
+
+            for paragraph in alternative.get("paragraphs", {}).get("paragraphs", []):
+                sentences = [
+                    _shift(sentence, offset)
+                    for sentence in paragraph["sentences"]
+                    if lo <= sentence["start"] + offset < hi
+                ]
+                if sentences:
+                    paragraph = _shift(paragraph, offset)
+                    paragraph.update(
+                        sentences=sentences,
+                        start=sentences[0]["start"],
+                        num_words=sum(len(sentence["text"].split()) for sentence in sentences),
+                    )
+                    if "speaker" in paragraph:
+                        paragraph["speaker"] = _speaker(
+                            mapping, paragraph["speaker"], speaker_state[c]
+                        )
+                    paragraphs[c].append(paragraph)
+
+            for field, value in alternative.items():
+                if field not in ("words", "paragraphs") and isinstance(value, list):
+                    extras[c].setdefault(field, []).extend(value)
+
+        for utterance in response["results"].get("utterances", []):
+            if lo <= utterance["start"] + offset < hi:
+                utterance = _shift(utterance, offset)
+                utterance["words"] = [_shift(word, offset) for word in utterance["words"]]
+                c = utterance.get("channel", 0)
+                if "speaker" in utterance:
+                    utterance["speaker"] = _speaker(
+                        mappings[c], utterance["speaker"], speaker_state[c]
+                    )
+                    for word in utterance["words"]:
+                        word["speaker"] = utterance["speaker"]
+                utterances.append(utterance)
+
+    for c, channel in enumerate(channels):
+        alternative = channel["alternatives"][0]
+        alternative.update(extras[c])
+        alternative["words"] = words[c]
+        alternative["transcript"] = " ".join(
+            word.get("punctuated_word", word["word"]) for word in words[c]
+        )
+        alternative["confidence"] = confidence[c][0] / confidence[c][1] if confidence[c][1] else 0
+        if "paragraphs" in alternative:
+            alternative["paragraphs"] = {
+                "transcript": _paragraphs_transcript(paragraphs[c]),
+                "paragraphs": paragraphs[c],
+            }
+    if "utterances" in merged["results"]:
+        merged["results"]["utterances"] = utterances
+    merged["metadata"]["duration"] = offsets[-1] + responses[-1]["metadata"]["duration"]
+    return merged
+
+
+def transcribe_chunks(
+    deepgram: PooledDeepgramClient,
+    audio: BinaryIO,
+    options: PrerecordedOptions,
+    chunk_seconds: float,
+    codec: str = "flac",
+    sample_rate: Optional[int] = None,
+    max_in_flight: int = 4,
+    overlap: float = OVERLAP_SECONDS,
+) -> Dict[str, Any]:
+    """Transcribe `audio` as parallel chunks of about `chunk_seconds`, and merge the results.
+
+    Chunks are encoded with `codec`, at `sample_rate` (default: the source rate), and
+    downmixed to mono unless `options.multichannel` is set.
+    """
+    audio.seek(0)
+    with sf.SoundFile(audio) as reader, contextlib.ExitStack() as stack:
+        rate = reader.samplerate
+        sample_rate = sample_rate or rate
+        with stage("split"):
+            bounds = [0.0] + split_points(frame_energy(reader), chunk_seconds) + [math.inf]
+        offsets = [max(0.0, bound - overlap) if i else 0.0 for i, bound in enumerate(bounds[:-1])]
+
+        sources = []
+        for i, offset in enumerate(offsets):
+            end = reader.frames if math.isinf(bounds[i + 1]) else int(bounds[i + 1] * rate)
+            chunk = stack.enter_context(tempfile.TemporaryFile())
+            start = int(offset * rate)
+            with stage("preprocess"):
+                encode(
+                    reader, chunk, codec, not options.multichannel, sample_rate, start, end - start
+                )
+            sources.append((str(i), {"buffer": chunk}))
+
+        chunk_options = dataclasses.replace(options, encoding=codec, sample_rate=sample_rate)
+        trace = current_trace()
+        queued_as, _ = current_session()
+
+        def transcribe_chunk(source: dict) -> Tuple[Dict[str, Any], bool]:
+            source["buffer"].seek(0)
+            # Chunk requests run in worker threads, but count towards the caller's request
+            # and queue with the caller's session
+            with attach(trace), session(queued_as):
+                return deepgram.transcribe_file({"stream": source["buffer"]}, chunk_options), False
+
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(sources)
+        for result in BatchTranscriber(transcribe_chunk, max_in_flight=max_in_flight).run(sources):
+            if result.error:
+                raise result.error
+            responses[int(result.name)] = result.response
+
+    with stage("merge"):
+        return merge_responses(responses, offsets, bounds)
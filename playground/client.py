@@ -0,0 +1,147 @@
+"""Deepgram client that reuses warm HTTP connections across requests, reruns and sessions."""
+
+import importlib.util
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+import httpx
+from deepgram import DeepgramClient, DeepgramClientOptions, PrerecordedOptions
+
+from playground.metrics import add_bytes, add_stage
+from playground.scheduler import Scheduler
+
+
+class _TimedStream(httpx.SyncByteStream):
+    """Request or response body that reports its size once it has been fully read."""
+
+    def __init__(self, stream: Iterable[bytes], on_end: Callable[[int], None]):
+        self._stream = stream
+        self._on_end = on_end
+
+    def __iter__(self) -> Iterator[bytes]:
+        size = 0
+        for chunk in self._stream:
+            size += len(chunk)
+            yield chunk
+        self._on_end(size)
+
+    def close(self) -> None:
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
+
+class PersistentTransport(httpx.HTTPTransport):
+    """HTTP transport whose connection pool outlives the clients using it.
+
+    The SDK opens and closes an `httpx.Client` around every request, which would close any
+    transport handed to it. This one ignores those closes; call `shutdown()` to close it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+
+    def __exit__(self, *args) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        super().close()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        # Splits each exchange into upload (sending the body), api (waiting for the response
+        # headers: network round trip plus Deepgram's processing) and download stages
+        started = time.perf_counter()
+        sent_at = started
+
+        def sent(size: int) -> None:
+            nonlocal sent_at
+            sent_at = time.perf_counter()
+            add_bytes(sent=size)
+
+        request.stream = _TimedStream(request.stream, sent)
+        response = super().handle_request(request)
+        headers_at = time.perf_counter()
+        add_stage("upload", sent_at - started)
+        add_stage("api", headers_at - sent_at)
+
+        def received(size: int) -> None:
+            self._local.received_at = time.perf_counter()
+            add_stage("download", self._local.received_at - headers_at)
+            add_bytes(received=size)
+
+        response.stream = _TimedStream(response.stream, received)
+        return response
+
+    def received_at(self) -> Optional[float]:
+        """When this thread last finished reading a response body"""
+        return getattr(self._local, "received_at", None)
+
+
+class PooledDeepgramClient(DeepgramClient):
+    """`DeepgramClient` whose prerecorded requests share one keep-alive connection pool.
+
+    HTTP/2 is used when the `h2` package is installed, so concurrent requests multiplex over
+    a single connection. Live connections send keep-alive messages during silences. With a
+    `scheduler`, prerecorded requests wait for it to admit them, and are queued again when
+    Deepgram rate limits them.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        timeout: Optional[httpx.Timeout] = None,
+        max_connections: int = 32,
+        keepalive_expiry: float = 60.0,
+        url: str = "",
+        scheduler: Optional[Scheduler] = None,
+    ):
+        super().__init__(api_key, DeepgramClientOptions(url=url, options={"keepalive": "true"}))
+        self.timeout = timeout or httpx.Timeout(300.0, connect=10.0)
+        self.transport = PersistentTransport(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            retries=1,
+        )
+        self.scheduler = scheduler
+
+    def _parsed(self, response) -> Dict[str, Any]:
+        # Whatever the SDK does after the body is read is JSON parsing and conversion
+        response = response.to_dict()
+        if (received_at := self.transport.received_at()) is not None:
+            add_stage("parse", time.perf_counter() - received_at)
+        return response
+
+    def _scheduled(self, request: Callable[[], Any], retry: bool = True) -> Dict[str, Any]:
+        if self.scheduler is None:
+            return self._parsed(request())
+        return self._parsed(self.scheduler.call(request, retry))
+
+    def transcribe_file(self, payload: dict, options: PrerecordedOptions) -> Dict[str, Any]:
+        stream = payload.get("stream")
+        # A stream has to be rewound to be sent again, which a generator of chunks can't be
+        seekable = stream is not None and getattr(stream, "seekable", lambda: False)()
+        position = stream.tell() if seekable else None
+
+        def request():
+            if position is not None:
+                stream.seek(position)
+            return self.listen.prerecorded.v("1").transcribe_file(
+                payload, options, timeout=self.timeout, transport=self.transport
+            )
+
+        return self._scheduled(request, retry=stream is None or position is not None)
+
+    def transcribe_url(self, source: dict, options: PrerecordedOptions) -> Dict[str, Any]:
+        return self._scheduled(
+            lambda: self.listen.prerecorded.v("1").transcribe_url(
+                source, options, timeout=self.timeout, transport=self.transport
+            )
+        )
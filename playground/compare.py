@@ -0,0 +1,118 @@
+"""Word-level comparison of transcripts: alignment, diff and word error rate.
+
+Transcripts are aligned by Levenshtein distance over words. Each row of the dynamic
+programme takes a handful of numpy operations: substitutions and deletions come from the
+row above element-wise, and the chain of insertions along the row is a running minimum,
+since `D[j] = min over k <= j of T[k] + (j - k)`. Small problems keep every row and trace
+the alignment back through them. Larger ones are split with Hirschberg's method (the
+optimal path crosses the middle row where the forward distances of the top half plus the
+backward distances of the bottom half are smallest), so memory stays linear in the length
+of the transcripts.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+FULL_CELLS = 1 << 20  # largest problem aligned from a full table, 4 MB of int32
+
+_PUNCTUATION = re.compile(r"[^\w']+")
+
+
+class Edit(NamedTuple):
+    op: str  # "equal", "substitute", "delete" or "insert"
+    reference: Optional[int]  # index of the word in the reference, unless inserted
+    hypothesis: Optional[int]  # and in the hypothesis, unless deleted
+
+
+class WordErrors(NamedTuple):
+    substitutions: int
+    deletions: int
+    insertions: int
+    reference_words: int
+
+    @property
+    def rate(self) -> float:
+        errors = self.substitutions + self.deletions + self.insertions
+        return errors / self.reference_words if self.reference_words else float(errors > 0)
+
+
+def normalize(words: Iterable[str]) -> List[str]:
+    """Words lowercased and without punctuation, so only what was heard can differ"""
+    return [_PUNCTUATION.sub("", word.lower()) for word in words]
+
+
+def _encode(reference: List[str], hypothesis: List[str]):
+    vocabulary: Dict[str, int] = {}
+    a = np.array([vocabulary.setdefault(word, len(vocabulary)) for word in reference], np.int32)
+    b = np.array([vocabulary.setdefault(word, len(vocabulary)) for word in hypothesis], np.int32)
+    return a, b
+
+
+def _rows(a: np.ndarray, b: np.ndarray) -> Iterator[np.ndarray]:
+    """Edit distances from each prefix of `a` to every prefix of `b`, a row at a time"""
+    columns = np.arange(len(b) + 1, dtype=np.int32)
+    row = columns
+    yield row
+    for i, word in enumerate(a, 1):
+        best = np.empty_like(row)
+        best[0] = i
+        np.minimum(row[:-1] + (b != word), row[1:] + 1, out=best[1:])
+        row = np.minimum.accumulate(best - columns) + columns
+        yield row
+
+
+def _last_row(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    for row in _rows(a, b):
+        pass
+    return row
+
+
+def _align_full(a: np.ndarray, b: np.ndarray, i0: int, j0: int, edits: List[Edit]) -> None:
+    table = np.stack(list(_rows(a, b)))
+    i, j = len(a), len(b)
+    backwards = []
+    while i or j:
+        if i and j and table[i, j] == table[i - 1, j - 1] + (a[i - 1] != b[j - 1]):
+            op = "equal" if a[i - 1] == b[j - 1] else "substitute"
+            backwards.append(Edit(op, i0 + i - 1, j0 + j - 1))
+            i, j = i - 1, j - 1
+        elif i and table[i, j] == table[i - 1, j] + 1:
+            backwards.append(Edit("delete", i0 + i - 1, None))
+            i -= 1
+        else:
+            backwards.append(Edit("insert", None, j0 + j - 1))
+            j -= 1
+    edits.extend(reversed(backwards))
+
+
+def _align(a: np.ndarray, b: np.ndarray, i0: int, j0: int, edits: List[Edit]) -> None:
+    if len(a) < 2 or (len(a) + 1) * (len(b) + 1) <= FULL_CELLS:
+        _align_full(a, b, i0, j0, edits)
+        return
+    middle = len(a) // 2
+    forward = _last_row(a[:middle], b)
+    backward = _last_row(a[middle:][::-1], b[::-1])[::-1]
+    split = int(np.argmin(forward + backward))
+    _align(a[:middle], b[:split], i0, j0, edits)
+    _align(a[middle:], b[split:], i0 + middle, j0 + split, edits)
+
+
+def align(reference: List[str], hypothesis: List[str]) -> List[Edit]:
+    """Fewest word edits turning `reference` into `hypothesis`, in order"""
+    edits: List[Edit] = []
+    _align(*_encode(reference, hypothesis), 0, 0, edits)
+    return edits
+
+
+def word_errors(edits: List[Edit]) -> WordErrors:
+    counts = {"equal": 0, "substitute": 0, "delete": 0, "insert": 0}
+    for edit in edits:
+        counts[edit.op] += 1
+    return WordErrors(
+        counts["substitute"],
+        counts["delete"],
+        counts["insert"],
+        counts["equal"] + counts["substitute"] + counts["delete"],
+    )
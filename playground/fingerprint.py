@@ -0,0 +1,323 @@
+"""Acoustic fingerprints, to recognise audio already transcribed under different bytes.
+
+Audio is downmixed and resampled to 8 kHz, and the strongest local maxima of its log
+spectrogram (at most `PEAKS_PER_SECOND`) are paired with the next `FAN_OUT` peaks. Each
+pair hashes the two frequencies and their time difference, which survive re-encoding,
+resampling and trimming; the anchor's frame is kept as its offset. A recording matches
+another when enough of its hashes occur in the other at one consistent time offset, and
+they do so throughout the recording, not just in a stretch the two have in common.
+"""
+
+import contextlib
+import os
+import sqlite3
+import time
+from collections import Counter, defaultdict
+from itertools import repeat
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+from numpy.lib.stride_tricks import sliding_window_view
+
+from playground.audio import Resampler
+from playground.cache import TranscriptCache
+from playground.chunking import merge_responses
+
+SAMPLE_RATE = 8000
+FFT_SIZE = 512
+HOP = 64
+FRAME_SECONDS = HOP / SAMPLE_RATE
+BLOCK_FRAMES = 4096
+PEAK_FRAMES = 10  # neighbourhood radius of a peak, in frames
+PEAK_BINS = 10  # and in frequency bins
+MIN_LEVEL = 1e-3  # peaks quieter than this (about -60 dBFS) are noise
+PEAKS_PER_SECOND = 15
+FAN_OUT = 5
+MAX_DELTA = 63  # frames between paired peaks, so it fits in 6 bits
+MIN_MATCHES = 20
+MIN_SCORE = 0.2
+MIN_COVERAGE = 0.98
+BIN_SECONDS = 5
+MIN_BIN_SCORE = 0.1  # of the hashes of every bin with at least MIN_MATCHES of them
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    options TEXT NOT NULL,
+    duration REAL NOT NULL,
+    indexed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    hash INTEGER NOT NULL,
+    recording INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_hash ON hashes (hash);
+CREATE INDEX IF NOT EXISTS hashes_recording ON hashes (recording);
+"""
+
+
+class Fingerprint(NamedTuple):
+    hashes: np.ndarray  # uint32
+    offsets: np.ndarray  # int32, frame of each hash's anchor peak
+    duration: float
+
+
+class Match(NamedTuple):
+    key: str
+    offset: float  # seconds into the matched recording where this one starts
+    score: float  # share of this recording's hashes found at that offset
+
+
+def _spectrogram(reader: sf.SoundFile) -> Iterator[np.ndarray]:
+    """Log-magnitude spectrogram frames of `reader`, a block at a time"""
+    resampler = Resampler(reader.samplerate, SAMPLE_RATE, 1)
+    downmix = np.full((reader.channels, 1), 1 / reader.channels, dtype=np.float32)
+    window = np.hanning(FFT_SIZE).astype(np.float32)
+    leftover = np.zeros(0, dtype=np.float32)
+    reader.seek(0)
+    for block in reader.blocks(
+        blocksize=reader.samplerate * BLOCK_FRAMES * HOP // SAMPLE_RATE,
+        dtype="float32",
+        always_2d=True,
+    ):
+        samples = np.concatenate([leftover, resampler.process(block @ downmix)[:, 0]])
+        if len(samples) < FFT_SIZE:
+            leftover = samples
+            continue
+        frames = sliding_window_view(samples, FFT_SIZE)[::HOP]
+        leftover = samples[len(frames) * HOP :]
+        yield np.log(np.abs(np.fft.rfft(frames * window, axis=1)) + MIN_LEVEL)
+
+
+def _running_max(values: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Maximum within `radius` of each element along `axis`, in O(log radius) passes.
+
+    Maxima over windows of doubling size are built up until one covers at least half the
+    window, and each window is then covered by two of those, overlapping.
+    """
+    values = np.moveaxis(values, axis, 0)
+    width = 2 * radius + 1
+    edge = np.full((radius,) + values.shape[1:], -np.inf, dtype=values.dtype)
+    maxima = np.concatenate([edge, values, edge])
+    size = 1
+    while size * 2 <= width:
+        maxima = np.maximum(maxima[:-size], maxima[size:])
+        size *= 2
+    n = len(values)
+    return np.moveaxis(np.maximum(maxima[:n], maxima[width - size : width - size + n]), 0, axis)
+
+
+def _local_maxima(spectrogram: np.ndarray) -> np.ndarray:
+    """Whether each cell is the loudest of its neighbourhood, and loud enough to count"""
+    maxima = _running_max(_running_max(spectrogram, PEAK_FRAMES, 0), PEAK_BINS, 1)
+    return (spectrogram == maxima) & (spectrogram > np.log(MIN_LEVEL * FFT_SIZE / 4))
+
+
+def _peaks(blocks: Iterator[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Frames and frequency bins of the strongest peaks, and the number of frames"""
+    frames, bins, levels = [], [], []
+    pending = np.zeros((0, FFT_SIZE // 2 + 1), dtype=np.float32)
+    start = context = 0  # frame number of `pending[0]`, and rows of it already searched
+
+    def search(spectrogram: np.ndarray, end: int) -> None:
+        # Only rows `context:end` have their whole neighbourhood in `spectrogram`
+        t, f = np.nonzero(_local_maxima(spectrogram)[context:end])
+        frames.append(t + start + context)
+        bins.append(f)
+        levels.append(spectrogram[t + context, f])
+
+    for block in blocks:
+        pending = np.concatenate([pending, block])
+        if len(pending) > context + PEAK_FRAMES:
+            search(pending, len(pending) - PEAK_FRAMES)
+            keep = 2 * PEAK_FRAMES
+            start += len(pending) - keep
+            pending, context = pending[-keep:], PEAK_FRAMES
+    search(pending, len(pending))
+
+    frames, bins, levels = np.concatenate(frames), np.concatenate(bins), np.concatenate(levels)
+    # The loudest PEAKS_PER_SECOND peaks of each second
+    second = (frames * FRAME_SECONDS).astype(np.int64)
+    order = np.lexsort((-levels, second))
+    first = np.searchsorted(second[order], second[order])
+    keep = order[np.arange(len(order)) - first < PEAKS_PER_SECOND]
+    keep = keep[np.lexsort((bins[keep], frames[keep]))]
+    return frames[keep], bins[keep], start + len(pending)
+
+
+def fingerprint_audio(audio: BinaryIO) -> Fingerprint:
+    """Fingerprint of audio libsndfile can decode, leaving the stream position unchanged."""
+    position = audio.tell()
+    try:
+        audio.seek(0)
+        with sf.SoundFile(audio) as reader:
+            frames, bins, count = _peaks(_spectrogram(reader))
+    finally:
+        audio.seek(position)
+
+    hashes, offsets = [], []
+    for step in range(1, FAN_OUT + 1):
+        delta = frames[step:] - frames[:-step]
+        valid = delta <= MAX_DELTA
+        anchor = frames[:-step][valid]
+        hashes.append(
+            (bins[:-step][valid].astype(np.uint32) << 15)
+            | (bins[step:][valid].astype(np.uint32) << 6)
+            | delta[valid].astype(np.uint32)
+        )
+        offsets.append(anchor.astype(np.int32))
+    return Fingerprint(
+        np.concatenate(hashes) if hashes else np.zeros(0, np.uint32),
+        np.concatenate(offsets) if offsets else np.zeros(0, np.int32),
+        count * FRAME_SECONDS,
+    )
+
+
+def realign(response: Dict[str, Any], match: Match, duration: float) -> Dict[str, Any]:
+    """Response for `duration` seconds of audio starting `match.offset` into the matched one"""
+    realigned = merge_responses([response], [-match.offset], [0.0, duration])
+    realigned["metadata"]["duration"] = duration
+    realigned["metadata"]["near_duplicate_of"] = dict(match._asdict())
+    return realigned
+
+
+class FingerprintIndex:
+    """Fingerprints of transcribed recordings, keyed by transcript cache key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, key: str, options: str, fingerprint: Fingerprint) -> None:
+        """Index the fingerprint of the audio transcribed with `options` (a hash) under `key`"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO recordings (key, options, duration, indexed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, options, fingerprint.duration, time.time()),
+            )
+            if cursor.rowcount:
+                conn.executemany(
+                    "INSERT INTO hashes VALUES (?, ?, ?)",
+                    zip(
+                        fingerprint.hashes.tolist(),
+                        repeat(cursor.lastrowid),
+                        fingerprint.offsets.tolist(),
+                    ),
+                )
+
+    def keys(self) -> List[str]:
+        with self._connect() as conn:
+            return [key for (key,) in conn.execute("SELECT key FROM recordings")]
+
+    def remove(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM hashes WHERE recording IN (SELECT id FROM recordings WHERE key = ?)",
+                (key,),
+            )
+            conn.execute("DELETE FROM recordings WHERE key = ?", (key,))
+
+    def match(self, options: str, fingerprint: Fingerprint) -> Optional[Match]:
+        """Best recording transcribed with `options` that contains the fingerprinted audio"""
+        if len(fingerprint.hashes) < MIN_MATCHES:
+            return None
+        # The two peaks of a pair can round to frames one further or closer apart in audio
+        # re-encoded or trimmed, so time differences either side are looked up too
+        delta = fingerprint.hashes & MAX_DELTA
+        hashes = [fingerprint.hashes]
+        offsets = [fingerprint.offsets]
+        for shift, valid in ((-1, delta > 0), (1, delta < MAX_DELTA)):
+            hashes.append((fingerprint.hashes[valid].astype(np.int64) + shift).astype(np.uint32))
+            offsets.append(fingerprint.offsets[valid])
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE query (hash INTEGER, offset INTEGER)")
+            conn.executemany(
+                "INSERT INTO query VALUES (?, ?)",
+                zip(np.concatenate(hashes).tolist(), np.concatenate(offsets).tolist()),
+            )
+            rows = conn.execute(
+                """
+                SELECT recordings.id, recordings.key, recordings.duration,
+                    hashes.offset - query.offset, COUNT(*)
+                FROM query
+                JOIN hashes ON hashes.hash = query.hash
+                JOIN recordings ON recordings.id = hashes.recording
+                WHERE recordings.options = ?
+                GROUP BY hashes.recording, hashes.offset - query.offset
+                HAVING COUNT(*) > 1
+                """,
+                (options,),
+            ).fetchall()
+
+            counts: Dict[Tuple[int, str, float], Counter] = defaultdict(Counter)
+            for recording, key, duration, delta, count in rows:
+                counts[recording, key, duration][delta] = count
+            candidates = []
+            for (recording, key, duration), deltas in counts.items():
+                # Likewise a peak can move by a frame, so neighbouring offsets count together
+                count, delta = max(
+                    (deltas[delta - 1] + deltas[delta] + deltas[delta + 1], delta)
+                    for delta in deltas
+                )
+                offset = delta * FRAME_SECONDS
+                score = min(1.0, count / len(fingerprint.hashes))
+                covered = min(duration, offset + fingerprint.duration) - max(0.0, offset)
+                if (
+                    count >= MIN_MATCHES
+                    and score >= MIN_SCORE
+                    and covered >= MIN_COVERAGE * fingerprint.duration
+                ):
+                    candidates.append((score, recording, key, delta))
+
+            for score, recording, key, delta in sorted(candidates, reverse=True):
+                hits = [
+                    offset
+                    for (offset,) in conn.execute(
+                        """
+                        SELECT query.offset
+                        FROM query JOIN hashes ON hashes.hash = query.hash
+                        WHERE hashes.recording = ?
+                            AND hashes.offset - query.offset BETWEEN ? AND ?
+                        """,
+                        (recording, delta - 1, delta + 1),
+                    )
+                ]
+                if _aligned_throughout(fingerprint.offsets, np.array(hits, dtype=np.int64)):
+                    return Match(key, delta * FRAME_SECONDS, score)
+        return None
+
+
+def _aligned_throughout(offsets: np.ndarray, hits: np.ndarray) -> bool:
+    """Whether hashes were found in every `BIN_SECONDS` of a recording with hashes at `offsets`.
+
+    Bins with fewer than `MIN_MATCHES` hashes, like silences, can't tell either way and are
+    left out. `hits` are the offsets of the hashes found at the matched alignment.
+    """
+    frames = round(BIN_SECONDS / FRAME_SECONDS)
+    hashes = np.bincount(offsets // frames)
+    found = np.bincount(hits // frames, minlength=len(hashes))[: len(hashes)]
+    counted = hashes >= MIN_MATCHES
+    return bool(np.all(found[counted] >= MIN_BIN_SCORE * hashes[counted]))
+
+
+def prune(index: FingerprintIndex, transcript_cache: TranscriptCache) -> None:
+    """Drop fingerprints of audio whose transcripts were evicted from, or expired in, the cache"""
+    cached = set(transcript_cache.keys())
+    for key in set(index.keys()) - cached:
+        index.remove(key)
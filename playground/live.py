@@ -0,0 +1,498 @@
+"""Relays audio streams to Deepgram live transcription on a background event loop."""
+
+import asyncio
+import contextlib
+import functools
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+import httpx
+from deepgram import DeepgramClient, LiveOptions, LiveTranscriptionEvents
+
+from playground.batch import backoff_delay
+from playground.captions import CaptionBuilder
+from playground.metrics import Metrics
+from playground.results import Word
+from playground.scheduler import Scheduler
+from playground.segmentlog import SegmentLog
+
+
+class TranscriptBuffer:
+    """Bounded live transcript that merges interim results in place.
+
+    Interim results replace each other until Deepgram finalizes the segment (`is_final`).
+    Finalized segments accumulate until the end of the utterance (`speech_final`, or
+    `max_pending` segments when endpointing is off), which is then moved to a ring
+    buffer of the last `max_utterances` utterances. Thread-safe; `version` increases on
+    every change so readers can skip redundant redraws.
+    """
+
+    def __init__(self, max_utterances: int = 500, max_pending: int = 10):
+        self.max_pending = max_pending
+        self.version = 0
+        self.dropped = 0
+        self._utterances: deque = deque(maxlen=max_utterances)
+        self._pending: List[str] = []
+        self._interim = ""
+        self._lock = threading.Lock()
+
+    def add(self, transcript: str, is_final: bool = True, speech_final: bool = False) -> None:
+        with self._lock:
+            if not is_final:
+                self._interim = transcript
+            else:
+                self._interim = ""
+                if transcript:
+                    self._pending.append(transcript)
+                if self._pending and (speech_final or len(self._pending) >= self.max_pending):
+                    if len(self._utterances) == self._utterances.maxlen:
+                        self.dropped += 1
+                    self._utterances.append(" ".join(self._pending))
+                    self._pending = []
+            self.version += 1
+
+    def lines(self) -> List[str]:
+        """Finalized utterances, followed by the utterance in progress if any."""
+        with self._lock:
+            lines = list(self._utterances)
+            if current := " ".join(self._pending + [self._interim]).strip():
+                lines.append(current)
+        return lines
+
+    def text(self) -> str:
+        lines = self.lines()
+        if self.dropped:
+            lines.insert(0, f"[... {self.dropped} earlier utterances]")
+        return "\n".join(lines)
+
+
+class Segment(NamedTuple):
+    received: float
+    stream: str
+    start: float
+    text: str
+
+
+class TranscriptStore:
+    """Bounded, timestamped log of finalized segments shared by every stream of a session."""
+
+    def __init__(self, max_segments: int = 2000):
+        self.version = 0
+        self._segments: deque = deque(maxlen=max_segments)
+        self._lock = threading.Lock()
+
+    def add(self, segment: Segment) -> None:
+        with self._lock:
+            self._segments.append(segment)
+            self.version += 1
+
+    def segments(self) -> List[Segment]:
+        with self._lock:
+            return list(self._segments)
+
+    def text(self) -> str:
+        return "\n".join(
+            f"[{time.strftime('%H:%M:%S', time.localtime(segment.received))}] "
+            f"{segment.stream}: {segment.text}"
+            for segment in self.segments()
+        )
+
+
+class ChunkSource:
+    """Audio written by another thread as it is captured, say from a microphone.
+
+    Writes are gathered into chunks of `chunk_size` bytes. At most `max_chunks` chunks wait
+    to be sent: if the connection falls that far behind, the oldest are dropped (and counted
+    in `dropped`) instead of piling up in memory for as long as the recording goes on. With
+    an `idle_timeout`, the source closes itself once nothing was written for that long.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        chunk_size: int = 8192,
+        max_chunks: int = 256,
+        idle_timeout: Optional[float] = None,
+    ):
+        self.name = name
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.idle_timeout = idle_timeout
+        self.closed = False
+        self.dropped = 0
+        self._written_at = time.monotonic()
+        self._chunks: deque = deque()
+        self._partial = bytearray()
+        self._ready = threading.Condition()
+
+    def write(self, data: bytes) -> None:
+        with self._ready:
+            if self.closed:
+                return
+            self._written_at = time.monotonic()
+            self._partial += data
+            while len(self._partial) >= self.chunk_size:
+                self._push(bytes(self._partial[: self.chunk_size]))
+                del self._partial[: self.chunk_size]
+
+    def close(self) -> None:
+        """End of the audio. What was written is still sent before the connection closes."""
+        with self._ready:
+            if self._partial and not self.closed:
+                self._push(bytes(self._partial))
+                self._partial.clear()
+            self.closed = True
+            self._ready.notify_all()
+
+    def read(self, timeout: float) -> Optional[bytes]:
+        """The next chunk, b"" if none comes within `timeout`, or None once closed and drained"""
+        with self._ready:
+            self._ready.wait_for(lambda: self._chunks or self.closed, timeout)
+            if self._chunks:
+                return self._chunks.popleft()
+            if (
+                self.idle_timeout is not None
+                and time.monotonic() - self._written_at > self.idle_timeout
+            ):
+                self.closed = True
+            return None if self.closed else b""
+
+    def _push(self, chunk: bytes) -> None:
+        if len(self._chunks) >= self.max_chunks:
+            self._chunks.popleft()
+            self.dropped += 1
+        self._chunks.append(chunk)
+        self._ready.notify()
+
+
+class LiveFeed:
+    """State and health of one stream. Written by the event loop, read by the script thread."""
+
+    STALL_SECONDS = 5
+
+    def __init__(self, source: Union[str, ChunkSource], max_utterances: int):
+        self.source = source
+        self.url = source if isinstance(source, str) else source.name
+        self.transcript = TranscriptBuffer(max_utterances)
+        self.captions: deque = deque(maxlen=max_utterances)
+        self.caption_builder = CaptionBuilder()
+        self.caption_offset = 0.0
+        self.status = "pending"
+        self.error: Optional[Exception] = None
+        self.reconnects = 0
+        self.bytes_sent = 0
+        self.bytes_per_second = 0.0
+        self.lag: Optional[float] = None
+        self.connected_at: Optional[float] = None
+        self.last_data_at: Optional[float] = None
+        self._window_start = 0.0
+        self._window_bytes = 0
+
+    def record_sent(self, size: int) -> None:
+        now = time.monotonic()
+        self.bytes_sent += size
+        self.last_data_at = now
+        self._window_bytes += size
+        if now - self._window_start >= 1:
+            self.bytes_per_second = self._window_bytes / (now - self._window_start)
+            self._window_start, self._window_bytes = now, 0
+
+    @property
+    def dropped(self) -> int:
+        """Chunks of captured audio dropped because the connection fell behind"""
+        return self.source.dropped if isinstance(self.source, ChunkSource) else 0
+
+    def record_result(self, start: float, duration: float) -> None:
+        """Lag is how far the transcribed audio trails the audio sent since connecting."""
+        if self.connected_at is not None:
+            self.lag = max(0.0, time.monotonic() - self.connected_at - (start + duration))
+
+    def health(self) -> Dict[str, Any]:
+        status = self.status
+        if (
+            status == "streaming"
+            and self.last_data_at is not None
+            and time.monotonic() - self.last_data_at > self.STALL_SECONDS
+        ):
+            status = "stalled"
+        return {
+            "Stream": self.url,
+            "Status": status,
+            "KB/s": round(self.bytes_per_second / 1024, 1),
+            "Lag (s)": None if self.lag is None else round(self.lag, 1),
+            "Sent (MB)": round(self.bytes_sent / 1024 / 1024, 2),
+            "Reconnects": self.reconnects,
+            "Dropped chunks": self.dropped,
+            "Last error": str(self.error) if self.error else "",
+        }
+
+
+class LiveTranscriber:
+    """Pipes one or more audio streams into Deepgram live connections.
+
+    Streams are HTTP URLs, or `ChunkSource`s for audio captured as it goes. All streams
+    share one private event loop, with one Deepgram connection per stream. For each stream,
+    a reader and a websocket sender run as separate tasks connected by a bounded queue: if
+    Deepgram is slow to accept audio the queue fills up and the reader stops pulling from
+    the stream. Once a stream ends, Deepgram is asked to finalize what it still holds, so
+    the transcript is complete when the stream's status turns "finished". Failed streams
+    reconnect with jittered backoff. With a `scheduler`, each stream first waits ("queued")
+    for one of its live connection slots, and keeps it across reconnects.
+    Nothing here touches Streamlit; the app polls `feeds`, `store`, `running` and `error`
+    from the script thread. With a `log`, every finalized result is also appended to it, and
+    the log is closed when the pipeline stops.
+    """
+
+    def __init__(
+        self,
+        deepgram: DeepgramClient,
+        sources: List[Union[str, ChunkSource]],
+        options: LiveOptions,
+        chunk_size: int = 8192,
+        queue_size: int = 32,
+        max_utterances: int = 500,
+        max_retries: int = 5,
+        finalize_timeout: float = 5.0,
+        metrics: Optional[Metrics] = None,
+        log: Optional[SegmentLog] = None,
+        scheduler: Optional[Scheduler] = None,
+    ):
+        self.deepgram = deepgram
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self.log = log
+        self.options = options
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.finalize_timeout = finalize_timeout
+        self.feeds = [LiveFeed(source, max_utterances) for source in sources]
+        self.store = TranscriptStore()
+        self.error: Optional[Exception] = None
+        self._stop_requested = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread = threading.Thread(target=self._main, name="live-transcriber", daemon=True)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def start(self) -> "LiveTranscriber":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Ask the pipeline to shut down. Safe to call from any thread, any number of times."""
+        self._stop_requested.set()
+        if self._loop is not None:
+            with contextlib.suppress(RuntimeError):  # loop already closed
+                self._loop.call_soon_threadsafe(self._stop.set)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+    def _main(self) -> None:
+        if self.log:
+            self.log.append(
+                {
+                    "type": "start",
+                    "started": time.time(),
+                    "streams": [feed.url for feed in self.feeds],
+                    "options": self.options.to_dict(),
+                }
+            )
+        try:
+            asyncio.run(self._run())
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.log:
+                self.log.close()
+
+    async def _run(self) -> None:
+        self._stop = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        if self._stop_requested.is_set():
+            return
+        await asyncio.gather(*(self._run_feed(feed) for feed in self.feeds))
+
+    async def _run_feed(self, feed: LiveFeed) -> None:
+        if self.scheduler and not await self._take_live_slot(feed):
+            feed.status = "stopped"
+            return
+        try:
+            await self._run_connections(feed)
+        finally:
+            if self.scheduler:
+                self.scheduler.release_live()
+
+    async def _take_live_slot(self, feed: LiveFeed) -> bool:
+        """Wait until the scheduler allows another live connection, unless stopped first"""
+        while not self.scheduler.acquire_live():
+            feed.status = "queued"
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._stop.wait(), 1.0)
+            if self._stop.is_set():
+                return False
+        return True
+
+    async def _run_connections(self, feed: LiveFeed) -> None:
+        failures = 0
+        while not self._stop.is_set():
+            feed.status = "reconnecting" if feed.reconnects else "connecting"
+            sent_before = feed.bytes_sent
+            try:
+                await self._stream(feed)
+                break
+            except Exception as e:
+                feed.error = e
+                # Only consecutive failures to get any audio through count towards giving up
+                failures = 1 if feed.bytes_sent > sent_before else failures + 1
+                if failures > self.max_retries:
+                    feed.status = "failed"
+                    return
+                feed.status = "waiting to reconnect"
+                feed.reconnects += 1
+                if self.metrics:
+                    self.metrics.inc("live_reconnects")
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._stop.wait(), backoff_delay(failures))
+        feed.captions.extend(feed.caption_builder.flush())
+        feed.status = "stopped" if self._stop.is_set() else "finished"
+
+    async def _stream(self, feed: LiveFeed) -> None:
+        connection = self.deepgram.listen.asynclive.v("1")
+        connection.on(
+            LiveTranscriptionEvents.Transcript, functools.partial(self._on_transcript, feed)
+        )
+        connection.on(LiveTranscriptionEvents.Error, functools.partial(self._on_error, feed))
+        finalized = asyncio.Event()
+
+        async def on_finalized(connection, result, **kwargs) -> None:
+            if getattr(result, "from_finalize", False):
+                finalized.set()
+
+        connection.on(LiveTranscriptionEvents.Transcript, on_finalized)
+        if await connection.start(self.options) is False:
+            raise ConnectionError("Failed to start connection")
+        feed.status = "streaming"
+        feed.connected_at = time.monotonic()
+        # Timestamps restart from zero on every connection, so captions carry on from the last cue
+        feed.captions.extend(feed.caption_builder.flush())
+        feed.caption_offset = feed.captions[-1].end if feed.captions else 0.0
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        reader = asyncio.create_task(self._read(feed, queue))
+        sender = asyncio.create_task(self._send(feed, connection, queue))
+        stopper = asyncio.create_task(self._stop.wait())
+        try:
+            # The reader ends the sender with a sentinel once the stream is exhausted, so
+            # we are done when the sender finishes, either task fails, or a stop is requested
+            pending = {reader, sender, stopper}
+            while sender in pending and stopper in pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done - {stopper}:
+                    if task.exception():
+                        raise task.exception()
+            if sender not in pending:
+                # Have Deepgram flush the audio it is still holding on to, or closing the
+                # connection would lose the end of the transcript
+                if await connection.finalize() is not False:
+                    waiter = asyncio.create_task(finalized.wait())
+                    await asyncio.wait(
+                        {waiter, stopper},
+                        timeout=self.finalize_timeout,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    waiter.cancel()
+        finally:
+            for task in (reader, sender, stopper):
+                task.cancel()
+            await asyncio.gather(reader, sender, stopper, return_exceptions=True)
+            await connection.finish()
+
+    async def _read(self, feed: LiveFeed, queue: asyncio.Queue) -> None:
+        if isinstance(feed.source, ChunkSource):
+            # Waited on in a worker thread, a second at a time so cancelling doesn't hang
+            while (chunk := await asyncio.to_thread(feed.source.read, 1.0)) is not None:
+                if chunk:
+                    await queue.put(chunk)
+            await queue.put(None)
+            return
+
+        timeout = httpx.Timeout(10.0, read=30.0)
+        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+            async with client.stream("GET", feed.url) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    await queue.put(chunk)
+        await queue.put(None)
+
+    async def _send(self, feed: LiveFeed, connection, queue: asyncio.Queue) -> None:
+        while (chunk := await queue.get()) is not None:
+            started = time.perf_counter()
+            if await connection.send(chunk) is False:
+                raise ConnectionError("Deepgram live connection closed")
+            feed.record_sent(len(chunk))
+            if self.metrics:
+                self.metrics.observe("live_chunk_send_seconds", time.perf_counter() - started)
+                self.metrics.inc("live_sent_bytes", len(chunk))
+                self.metrics.inc("live_chunks")
+
+    async def _on_transcript(self, feed: LiveFeed, connection, result, **kwargs) -> None:
+        alternative = result.channel.alternatives[0]
+        feed.transcript.add(alternative.transcript, result.is_final, result.speech_final)
+        feed.record_result(result.start, result.duration)
+        if self.metrics and feed.lag is not None:
+            self.metrics.observe(
+                "live_transcript_lag_seconds", feed.lag, final=str(result.is_final)
+            )
+        if result.is_final:
+            # Rolling captions from finalized words; the cue in progress is closed at the
+            # end of each utterance so it shows up without waiting for the next one
+            feed.captions.extend(
+                feed.caption_builder.add(
+                    Word(
+                        word.punctuated_word or word.word,
+                        word.start + feed.caption_offset,
+                        word.end + feed.caption_offset,
+                        word.confidence,
+                        word.speaker,
+                    )
+                    for word in alternative.words or []
+                )
+            )
+            if result.speech_final:
+                feed.captions.extend(feed.caption_builder.flush())
+            if alternative.transcript:
+                received = time.time()
+                self.store.add(Segment(received, feed.url, result.start, alternative.transcript))
+                if self.log:
+                    self.log.append(
+                        {
+                            "type": "result",
+                            "received": received,
+                            "stream": feed.url,
+                            "start": result.start + feed.caption_offset,
+                            "duration": result.duration,
+                            "text": alternative.transcript,
+                            "confidence": alternative.confidence,
+                            "speech_final": result.speech_final,
+                            # text, start, end, confidence, speaker
+                            "words": [
+                                [
+                                    word.punctuated_word or word.word,
+                                    word.start + feed.caption_offset,
+                                    word.end + feed.caption_offset,
+                                    word.confidence,
+                                    word.speaker,
+                                ]
+                                for word in alternative.words or []
+                            ],
+                        }
+                    )
+
+    async def _on_error(self, feed: LiveFeed, connection, error, **kwargs) -> None:
+        feed.error = RuntimeError(getattr(error, "message", None) or str(error))
@@ -0,0 +1,229 @@
+"""In-process metrics for the request hot paths, exportable as OpenMetrics text or JSONL.
+
+A `Trace` collects the time spent in each stage of one transcription request. Code on the
+request path adds to the trace of the current thread through `stage()`, `add_stage()` and
+`add_bytes()`, which do nothing when no trace is active, so the helpers below stay usable
+without the app. Finished traces are kept (the most recent `max_traces`) and folded into
+per-stage histograms; other measurements go straight to counters and histograms.
+"""
+
+import bisect
+import contextlib
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+PREFIX = "deepgram_playground_"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = SECONDS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Trace:
+    """Per-stage timings (seconds, cumulative over threads) and sizes of one request."""
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.started = time.time()
+        self.stages: Dict[str, float] = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.cached: Optional[bool] = None
+        self.audio_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "started": self.started,
+            "stages": {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "cached": self.cached,
+            "audio_seconds": self.audio_seconds,
+            "error": self.error,
+        }
+
+
+_local = threading.local()
+
+
+def current_trace() -> Optional[Trace]:
+    return getattr(_local, "trace", None)
+
+
+@contextlib.contextmanager
+def attach(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Make `trace` the current trace of this thread, e.g. in a worker thread."""
+    previous = current_trace()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def add_stage(stage: str, seconds: float) -> None:
+    if trace := current_trace():
+        trace.add(stage, seconds)
+
+
+def add_bytes(sent: int = 0, received: int = 0) -> None:
+    if trace := current_trace():
+        with trace._lock:
+            trace.bytes_sent += sent
+            trace.bytes_received += received
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage(name, time.perf_counter() - started)
+
+
+class Metrics:
+    """Thread-safe registry of counters, histograms and recent request traces."""
+
+    def __init__(self, max_traces: int = 500):
+        self.traces: deque = deque(maxlen=max_traces)
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(value)
+
+    @contextlib.contextmanager
+    def trace(self, kind: str, name: str) -> Iterator[Trace]:
+        """Trace the request made in the `with` block, and record it when the block exits."""
+        with attach(Trace(kind, name)) as trace:
+            started = time.perf_counter()
+            try:
+                yield trace
+            except Exception as e:
+                trace.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                trace.add("total", time.perf_counter() - started)
+                self.record(trace)
+
+    def record(self, trace: Trace) -> None:
+        self.traces.append(trace)
+        for stage_name, seconds in trace.stages.items():
+            self.observe("request_stage_seconds", seconds, kind=trace.kind, stage=stage_name)
+        self.inc("requests", kind=trace.kind, result="error" if trace.error else "ok")
+        if trace.cached is not None:
+            self.inc("cache_lookups", result="hit" if trace.cached else "miss")
+        self.inc("request_sent_bytes", trace.bytes_sent, kind=trace.kind)
+        self.inc("request_received_bytes", trace.bytes_received, kind=trace.kind)
+        if trace.audio_seconds:
+            self.inc("audio_seconds", trace.audio_seconds, kind=trace.kind)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Count, mean and approximate p50/p99 of every histogram."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        return [
+            {
+                "Metric": name,
+                "Labels": ", ".join(f"{key}={value}" for key, value in labels),
+                "Count": histogram.count,
+                "Mean (ms)": round(histogram.sum / histogram.count * 1000, 1),
+                "p50 (ms) ≤": histogram.quantile(0.5) * 1000,
+                "p99 (ms) ≤": histogram.quantile(0.99) * 1000,
+            }
+            for (name, labels), histogram in histograms
+            if histogram.count
+        ]
+
+    def openmetrics(self) -> str:
+        """All counters and histograms in the OpenMetrics text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count, h.buckets))
+                for key, h in self._histograms.items()
+            )
+
+        lines = []
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            for (counter_name, labels), value in counters:
+                if counter_name == name:
+                    lines.append(f"{PREFIX}{name}_total{_labels(labels)} {value}")
+        for name in sorted({name for (name, _), _ in histograms}):
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            lines.append(f"# UNIT {PREFIX}{name} seconds")
+            for (histogram_name, labels), (counts, total, count, buckets) in histograms:
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else str(float(bound))
+                    lines.append(
+                        f"{PREFIX}{name}_bucket{_labels(labels + (('le', le),))} {cumulative}"
+                    )
+                lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{PREFIX}{name}_count{_labels(labels)} {count}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def jsonl(self) -> Iterator[str]:
+        """Recent request traces, one JSON object per line."""
+        for trace in list(self.traces):
+            yield json.dumps(trace.to_dict()) + "\n"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
@@ -0,0 +1,264 @@
+"""Local stand-in for Deepgram's `listen` endpoints, for benchmarks that spend no API credits.
+
+Prerecorded requests (`POST /v1/listen`) are answered with a synthetic transcript whose
+length follows the size of the uploaded audio, after a configurable delay. Live connections
+(`/v1/listen` over a websocket) get one final result per second of audio received, and one
+for the rest of it when they send `Finalize`. The
+server also streams silent linear16 audio from `GET /audio?seconds=N`, as a source for live
+transcription. Audio is never decoded: its duration is estimated from its size.
+"""
+
+import asyncio
+import functools
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from websockets.asyncio.server import serve
+
+SAMPLE_RATE = 16000
+BYTES_PER_SECOND = SAMPLE_RATE * 2  # 16-bit mono linear16
+READ_SIZE = 1 << 20
+
+
+@functools.lru_cache(maxsize=32)
+def _words(count: int, seconds_per_word: float) -> Tuple[str, str]:
+    """JSON of `count` word objects, and of their transcript"""
+    words = [
+        {
+            "word": f"word{i}",
+            "start": round(i * seconds_per_word, 3),
+            "end": round((i + 0.8) * seconds_per_word, 3),
+            "confidence": 0.98,
+            "punctuated_word": f"Word{i}.",
+            "speaker": i // 20 % 2,
+        }
+        for i in range(count)
+    ]
+    return json.dumps(words), json.dumps(" ".join(f"word{i}" for i in range(count)))
+
+
+def _response_json(duration: float, words_per_second: float) -> bytes:
+    count = int(duration * words_per_second)
+    words, transcript = _words(count, 1 / words_per_second)
+    # Spliced together as text: the word list is the bulk of the payload and is reused
+    return (
+        '{"metadata": {"request_id": "%s", "duration": %f, "channels": 1, '
+        '"models": ["mock"], "model_info": {}}, "results": {"channels": [{"alternatives": '
+        '[{"transcript": %s, "confidence": 0.98, "words": %s}]}]}}'
+        % (uuid.uuid4(), duration, transcript, words)
+    ).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_HTTPServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _read_body(self) -> int:
+        """Read and discard the request body, returning its size"""
+        size = 0
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while chunk_size := int(self.rfile.readline().split(b";")[0], 16):
+                for start in range(0, chunk_size, READ_SIZE):
+                    size += len(self.rfile.read(min(READ_SIZE, chunk_size - start)))
+                self.rfile.readline()
+            while self.rfile.readline() not in (b"\r\n", b"\n", b""):  # trailers
+                pass
+        else:
+            remaining = int(self.headers.get("Content-Length") or 0)
+            while remaining > 0:
+                read = len(self.rfile.read(min(READ_SIZE, remaining)))
+                if not read:
+                    break
+                size += read
+                remaining -= read
+        return size
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        mock = self.server.mock
+        size = self._read_body()
+        if not urlparse(self.path).path.rstrip("/").endswith("/listen"):
+            self._send(404, b'{"err_msg": "Not found"}')
+            return
+        duration = size / mock.bytes_per_second
+        time.sleep(mock.latency + duration * mock.processing_factor)
+        self._send(200, _response_json(duration, mock.words_per_second))
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/audio":
+            self._send(404, b'{"err_msg": "Not found"}')
+            return
+        # Silent audio at `speed` times real time
+        query = parse_qs(url.query)
+        size = int(float(query.get("seconds", ["60"])[0]) * BYTES_PER_SECOND)
+        speed = float(query.get("speed", ["1"])[0])
+        chunk = bytes(BYTES_PER_SECOND // 10)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/l16")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        started = time.monotonic()
+        try:
+            for sent in range(0, size, len(chunk)):
+                self.wfile.write(chunk[: size - sent])
+                if (ahead := sent / BYTES_PER_SECOND / speed - (time.monotonic() - started)) > 0:
+                    time.sleep(ahead)
+        except OSError:  # client went away
+            pass
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    mock: "MockDeepgram"
+
+
+class MockDeepgram:
+    """The stand-in server, on an HTTP and a websocket port of `host`.
+
+    `latency` is added to every response, plus `processing_factor` seconds per second of
+    prerecorded audio; transcripts contain `words_per_second` words per second of audio.
+    Use as a context manager, then point clients at `http_url` and `ws_url`.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        http_port: int = 0,
+        ws_port: int = 0,
+        latency: float = 0.05,
+        processing_factor: float = 0.0,
+        words_per_second: float = 2.5,
+        bytes_per_second: int = BYTES_PER_SECOND,
+    ):
+        self.host = host
+        self.latency = latency
+        self.processing_factor = processing_factor
+        self.words_per_second = words_per_second
+        self.bytes_per_second = bytes_per_second
+        self._http = _HTTPServer((host, http_port), _Handler)
+        self._http.mock = self
+        self._ws_port = ws_port
+        self._ws_ready = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._threads = [
+            threading.Thread(target=self._http.serve_forever, name="mock-http", daemon=True),
+            threading.Thread(target=self._serve_ws, name="mock-ws", daemon=True),
+        ]
+
+    @property
+    def http_url(self) -> str:
+        return f"http://{self.host}:{self._http.server_address[1]}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self._ws_port}"
+
+    def audio_url(self, seconds: float, speed: float = 1.0) -> str:
+        return f"{self.http_url}/audio?seconds={seconds}&speed={speed}"
+
+    def start(self) -> "MockDeepgram":
+        for thread in self._threads:
+            thread.start()
+        self._ws_ready.wait()
+        return self
+
+    def stop(self) -> None:
+        self._http.shutdown()
+        self._http.server_close()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> "MockDeepgram":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _serve_ws(self) -> None:
+        async def main():
+            self._loop = asyncio.get_running_loop()
+            self._stop = asyncio.Event()
+            async with serve(self._live, self.host, self._ws_port) as server:
+                self._ws_port = server.sockets[0].getsockname()[1]
+                self._ws_ready.set()
+                await self._stop.wait()
+
+        asyncio.run(main())
+
+    def _result(self, start: float, duration: float = 1.0, from_finalize: bool = False) -> str:
+        count = max(1, round(duration * self.words_per_second)) if duration else 0
+        words, transcript = _words(count, 1 / self.words_per_second)
+        words = json.loads(words)
+        for word in words:
+            word["start"] += start
+            word["end"] += start
+        return json.dumps(
+            {
+                "type": "Results",
+                "channel_index": [0, 1],
+                "duration": duration,
+                "start": start,
+                "is_final": True,
+                "speech_final": from_finalize or int(start) % 5 == 4,
+                "from_finalize": from_finalize,
+                "channel": {
+                    "alternatives": [
+                        {"transcript": json.loads(transcript), "confidence": 0.98, "words": words}
+                    ]
+                },
+                "metadata": {
+                    "request_id": "mock",
+                    "model_info": {"name": "mock", "version": "mock", "arch": "mock"},
+                    "model_uuid": "mock",
+                },
+            }
+        )
+
+    async def _live(self, websocket) -> None:
+        received = 0
+        results = 0
+        pending = set()
+
+        def send_later(message: str) -> None:
+            async def send() -> None:
+                await asyncio.sleep(self.latency)
+                await websocket.send(message)
+
+            task = asyncio.create_task(send())
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        async for message in websocket:
+            if isinstance(message, str):
+                kind = json.loads(message).get("type")
+                if kind == "CloseStream":
+                    break
+                if kind == "Finalize":
+                    # Whatever arrived since the last whole second
+                    rest = received / self.bytes_per_second - results
+                    send_later(self._result(float(results), round(rest, 3), from_finalize=True))
+                continue  # KeepAlive
+            received += len(message)
+            while received >= (results + 1) * self.bytes_per_second:
+                send_later(self._result(float(results)))
+                results += 1
+        await asyncio.gather(*pending, return_exceptions=True)
+        await websocket.close()
@@ -0,0 +1,155 @@
+"""What a transcription is made of, shared by the Streamlit app and the headless worker.
+
+Options are built from the model and language names the app offers, sources from file
+paths and URLs, and the client, transcript cache and fingerprint index from the same
+`DEEPGRAM_PLAYGROUND_*` environment variables, so both share one cache directory and
+give the same results for the same audio and options.
+"""
+
+import os
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, Optional
+
+import httpx
+from deepgram import LiveOptions, PrerecordedOptions
+
+from playground.cache import TranscriptCache
+from playground.client import PooledDeepgramClient
+from playground.scheduler import Scheduler
+
+if TYPE_CHECKING:
+    from playground.fingerprint import FingerprintIndex
+
+MODELS = {
+    "Nova-2": "nova-2-ea",
+    "Nova": "nova",
+    "Whisper Cloud": "whisper-medium",
+    "Enhanced": "enhanced",
+    "Base": "base",
+}
+
+AUTO_LANGUAGE = "Automatic Language Detection"
+LANGUAGES = {
+    AUTO_LANGUAGE: None,
+    "English": "en",
+    "French": "fr",
+    "Hindi": "hi",
+}
+
+CACHE_DIR = os.getenv("DEEPGRAM_PLAYGROUND_CACHE_DIR", ".cache")
+CACHE_MAX_MB = int(os.getenv("DEEPGRAM_PLAYGROUND_CACHE_MAX_MB", "1024"))
+CACHE_TTL_DAYS = float(os.getenv("DEEPGRAM_PLAYGROUND_CACHE_TTL_DAYS", "30"))
+REQUEST_TIMEOUT = float(os.getenv("DEEPGRAM_PLAYGROUND_REQUEST_TIMEOUT", "300"))
+CONNECT_TIMEOUT = float(os.getenv("DEEPGRAM_PLAYGROUND_CONNECT_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("DEEPGRAM_PLAYGROUND_MAX_CONNECTIONS", "32"))
+BATCH_MAX_IN_FLIGHT = int(os.getenv("DEEPGRAM_PLAYGROUND_BATCH_MAX_IN_FLIGHT", "4"))
+NEAR_DUPLICATES = os.getenv("DEEPGRAM_PLAYGROUND_NEAR_DUPLICATES", "0") == "1"
+# Shared by every session using the same API key. A rate of 0 means no rate limit
+KEY_RATE_LIMIT = float(os.getenv("DEEPGRAM_PLAYGROUND_KEY_RATE_LIMIT", "0"))
+KEY_BURST = int(os.getenv("DEEPGRAM_PLAYGROUND_KEY_BURST", "10"))
+KEY_MAX_CONCURRENT = int(os.getenv("DEEPGRAM_PLAYGROUND_KEY_MAX_CONCURRENT", "16"))
+KEY_MAX_LIVE = int(os.getenv("DEEPGRAM_PLAYGROUND_KEY_MAX_LIVE", "8"))
+
+AUDIO_EXTENSIONS = {".aac", ".flac", ".m4a", ".mp3", ".mp4", ".ogg", ".opus", ".wav", ".webm"}
+
+
+def language_options(language: str) -> Dict[str, Any]:
+    """`language`, or `detect_language`, option for a `LANGUAGES` name"""
+    if language == AUTO_LANGUAGE:
+        return {"detect_language": True}
+    return {"language": LANGUAGES[language]}
+
+
+def _common_options(
+    model: str, language: Optional[str], redact: Iterable[Optional[str]], search_terms: str
+) -> Dict[str, Any]:
+    return {
+        "model": MODELS[model],
+        **(language_options(language) if language else {}),
+        "redact": [option for option in redact if option],
+        "search": f"""[{search_terms or ""}]""",
+    }
+
+
+def prerecorded_options(
+    model: str,
+    language: Optional[str] = AUTO_LANGUAGE,
+    redact: Iterable[Optional[str]] = (),
+    search_terms: str = "",
+    **features: Any,
+) -> PrerecordedOptions:
+    """Options for a `MODELS` and `LANGUAGES` name, with the other features as given"""
+    return PrerecordedOptions(**_common_options(model, language, redact, search_terms), **features)
+
+
+def live_options(
+    model: str,
+    language: Optional[str] = None,
+    redact: Iterable[Optional[str]] = (),
+    search_terms: str = "",
+    **features: Any,
+) -> LiveOptions:
+    """Like `prerecorded_options`, for a live stream, which can't detect its language"""
+    if language == AUTO_LANGUAGE:
+        raise ValueError("Live streams can't detect their language")
+    return LiveOptions(**_common_options(model, language, redact, search_terms), **features)
+
+
+def deepgram_client(api_key: str, url: str = "") -> PooledDeepgramClient:
+    """Client with its connection pool and scheduler, for the whole life of the process"""
+    return PooledDeepgramClient(
+        api_key,
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        max_connections=MAX_CONNECTIONS,
+        url=url,
+        scheduler=Scheduler(
+            rate=KEY_RATE_LIMIT or None,
+            burst=KEY_BURST,
+            max_concurrent=KEY_MAX_CONCURRENT,
+            max_live=KEY_MAX_LIVE,
+        ),
+    )
+
+
+def transcript_cache() -> TranscriptCache:
+    return TranscriptCache(
+        os.path.join(CACHE_DIR, "transcripts"),
+        max_bytes=CACHE_MAX_MB * 1024 * 1024,
+        ttl=CACHE_TTL_DAYS * 24 * 60 * 60,
+    )
+
+
+def fingerprint_index() -> Optional["FingerprintIndex"]:
+    """Fingerprints of transcribed audio, or None with near-duplicate reuse turned off"""
+    if not NEAR_DUPLICATES:
+        return None
+    from playground.fingerprint import FingerprintIndex
+
+    return FingerprintIndex(os.path.join(CACHE_DIR, "fingerprints.sqlite3"))
+
+
+def prepare_source(target: str) -> dict:
+    """Source for an audio URL or local file path, as `transcribe` takes it"""
+    if target.startswith(("http://", "https://")):
+        return {"url": target}
+    if not os.path.isfile(target):
+        raise FileNotFoundError(f"No such audio file: {target}")
+    return {"path": target}
+
+
+def audio_files(directory: str) -> Iterator[str]:
+    """Audio files anywhere under `directory`, by extension, in a stable order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                yield os.path.join(root, name)
+
+
+def source_name(source: dict) -> str:
+    if "url" in source:
+        return source["url"]
+    if "download" in source:
+        return f"YouTube video {source['download'].key}"
+    if "path" in source:
+        return os.path.basename(source["path"])
+    return getattr(source["buffer"], "name", None) or "Recording"
@@ -0,0 +1,43 @@
+"""Microphone audio captured in the browser over WebRTC, relayed to live transcription.
+
+Frames arrive as the browser captures them, typically 20 ms of 48 kHz audio each, and are
+converted to 16 kHz mono linear16 before they are written to the `ChunkSource` that a
+`LiveTranscriber` streams to Deepgram.
+"""
+
+from typing import Iterable
+
+import av
+
+from playground.live import ChunkSource
+
+SAMPLE_RATE = 16000
+CHUNK_SECONDS = 0.1
+CHUNK_SIZE = int(SAMPLE_RATE * 2 * CHUNK_SECONDS)
+
+
+class MicrophoneRelay:
+    """Writes WebRTC audio frames to `source` as 16 kHz mono linear16."""
+
+    def __init__(self, source: ChunkSource):
+        self.source = source
+        self._resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+
+    def __call__(self, frames: Iterable[av.AudioFrame]) -> None:
+        for frame in frames:
+            for resampled in self._resampler.resample(frame):
+                self.source.write(resampled.to_ndarray().tobytes())
+
+
+def recording_source(max_seconds: float = 30.0, idle_timeout: float = 30.0) -> ChunkSource:
+    """Source for a microphone, buffering up to `max_seconds` of audio Deepgram hasn't taken.
+
+    The browser sends frames even while nobody speaks, so a recording that has sent nothing
+    for `idle_timeout` seconds was abandoned (say, the tab was closed) and is ended.
+    """
+    return ChunkSource(
+        "Microphone",
+        chunk_size=CHUNK_SIZE,
+        max_chunks=max(1, int(max_seconds * SAMPLE_RATE * 2 / CHUNK_SIZE)),
+        idle_timeout=idle_timeout,
+    )
@@ -0,0 +1,142 @@
+"""Parsing of prerecorded responses, across every channel, into what the app displays.
+
+Words from all channels are merged into one timeline and kept as parallel arrays in a
+`WordStore`, which the transcript, caption, word table and search views share instead of
+each walking the nested response again.
+"""
+
+import heapq
+from array import array
+from itertools import count, repeat
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+NO_SPEAKER = -1
+
+
+class Word(NamedTuple):
+    text: str
+    start: float
+    end: float
+    confidence: float = 0.0
+    speaker: Optional[int] = None
+    channel: int = 0
+
+
+class Turn(NamedTuple):
+    channel: int
+    speaker: Optional[int]
+    start: float
+    text: str
+
+
+class WordStore:
+    """Words of a response in start time order, one compact array per field."""
+
+    def __init__(self):
+        self.text: List[str] = []
+        self.start = array("d")
+        self.end = array("d")
+        self.confidence = array("d")
+        self.speaker = array("i")
+        self.channel = array("H")
+
+    @classmethod
+    def from_channels(cls, channels: List[List[Dict[str, Any]]]) -> "WordStore":
+        """Merge the (start-ordered) word lists of each channel, in O(n log channels)."""
+        store = cls()
+        merged = heapq.merge(
+            *(
+                zip((word["start"] for word in words), repeat(c), count(), words)
+                for c, words in enumerate(channels)
+            )
+        )
+        for start, c, _, word in merged:
+            store.text.append(word.get("punctuated_word") or word["word"])
+            store.start.append(start)
+            store.end.append(word["end"])
+            store.confidence.append(word.get("confidence", 0.0))
+            store.speaker.append(word.get("speaker", NO_SPEAKER))
+            store.channel.append(c)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __getitem__(self, i: int) -> Word:
+        speaker = self.speaker[i]
+        return Word(
+            self.text[i],
+            self.start[i],
+            self.end[i],
+            self.confidence[i],
+            None if speaker == NO_SPEAKER else speaker,
+            self.channel[i],
+        )
+
+    def __iter__(self) -> Iterator[Word]:
+        for text, start, end, confidence, speaker, channel in zip(
+            self.text, self.start, self.end, self.confidence, self.speaker, self.channel
+        ):
+            yield Word(
+                text, start, end, confidence, None if speaker == NO_SPEAKER else speaker, channel
+            )
+
+    def words(self, channel: Optional[int] = None) -> Iterator[Word]:
+        """Words of one channel, or of all of them."""
+        return iter(self) if channel is None else (w for w in self if w.channel == channel)
+
+    def turns(self, channel: Optional[int] = None) -> Iterator[Turn]:
+        """Runs of consecutive words from the same channel and speaker."""
+        turn: List[Word] = []
+        for word in self.words(channel):
+            if turn and (word.channel, word.speaker) != (turn[0].channel, turn[0].speaker):
+                yield Turn(turn[0].channel, turn[0].speaker, turn[0].start, _join(turn))
+                turn = []
+            turn.append(word)
+        if turn:
+            yield Turn(turn[0].channel, turn[0].speaker, turn[0].start, _join(turn))
+
+
+def _join(words: List[Word]) -> str:
+    return " ".join(word.text for word in words)
+
+
+class Channel(NamedTuple):
+    index: int
+    transcript: str
+    summaries: List[str]
+    detected_language: Optional[str]
+
+
+class ParsedResponse(NamedTuple):
+    channels: List[Channel]
+    words: WordStore
+
+
+def channel_transcript(channel: Dict[str, Any]) -> str:
+    alternative = channel["alternatives"][0]
+    if "paragraphs" in alternative:
+        return alternative["paragraphs"]["transcript"]
+    return alternative["transcript"]
+
+
+def parse_response(response: Dict[str, Any]) -> ParsedResponse:
+    channels = response["results"]["channels"]
+    return ParsedResponse(
+        [
+            Channel(
+                c,
+                channel_transcript(channel),
+                [
+                    summary["summary"]
+                    for summary in channel["alternatives"][0].get("summaries", [])
+                    if summary.get("summary")
+                ],
+                channel.get("detected_language"),
+            )
+            for c, channel in enumerate(channels)
+        ],
+        WordStore.from_channels(
+            [channel["alternatives"][0].get("words", []) for channel in channels]
+        ),
+    )
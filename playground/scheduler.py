@@ -0,0 +1,225 @@
+"""Admission control for the Deepgram requests of one API key, shared by every session.
+
+Prerecorded requests take a token from a bucket refilled at `rate` per second (holding at
+most `burst`), and at most `max_concurrent` run at once. Requests that can't start yet
+queue per session, and sessions take turns: while n sessions wait, one with a large batch
+queued gets every n-th slot instead of everything ahead of the others. When Deepgram turns
+a request away with a 429 regardless, admission pauses for everyone on the key before that
+request queues again. Live connections hold their socket for as long as the stream runs,
+so they are capped separately at `max_live`.
+
+The session a request is queued under is set per thread with `session()`.
+"""
+
+import contextlib
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, NamedTuple, Optional, Tuple, TypeVar
+
+from deepgram import DeepgramApiError, DeepgramUnknownApiError
+
+from playground.batch import backoff_delay
+from playground.metrics import add_stage
+
+T = TypeVar("T")
+
+
+class QueueStatus(NamedTuple):
+    position: int  # 1 when next in line
+    eta: Optional[float]  # seconds until it starts, when there is enough to go on
+
+
+OnWait = Callable[[QueueStatus], None]
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def session(name: str, on_wait: Optional[OnWait] = None) -> Iterator[None]:
+    """Queue this thread's requests under session `name`, calling `on_wait` as they move up"""
+    previous = getattr(_local, "session", None)
+    _local.session = (name, on_wait)
+    try:
+        yield
+    finally:
+        _local.session = previous
+
+
+def current_session() -> Tuple[str, Optional[OnWait]]:
+    return getattr(_local, "session", None) or ("", None)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return (
+        isinstance(error, (DeepgramApiError, DeepgramUnknownApiError))
+        and str(error.status) == "429"
+    )
+
+
+class _Ticket:
+    __slots__ = ("admitted",)
+
+    def __init__(self):
+        self.admitted = False
+
+
+class Scheduler:
+    """Token bucket, concurrency caps and fair queue for one API key. Thread-safe."""
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 10,
+        max_concurrent: int = 16,
+        max_live: int = 8,
+        max_retries: int = 3,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_live = max_live
+        self.max_retries = max_retries
+        self.service_seconds: Optional[float] = None  # moving average, for ETAs
+        self.live = 0
+        self.running = 0
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        # Waiting requests per session, in the order sessions take their turns
+        self._waiting: Dict[str, deque] = {}
+        self._changed = threading.Condition()
+
+    def _dispatch(self) -> Optional[float]:
+        """Admit waiting requests while there is room, returning how long until a token is due"""
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        admitted = False
+        try:
+            while self._waiting and self.running < self.max_concurrent:
+                if now < self._paused_until:
+                    return self._paused_until - now
+                if self.rate and self._tokens < 1:
+                    return (1 - self._tokens) / self.rate
+                name, tickets = next(iter(self._waiting.items()))
+                del self._waiting[name]
+                tickets.popleft().admitted = True
+                if tickets:
+                    self._waiting[name] = tickets  # to the back of the line
+                self._tokens -= 1
+                self.running += 1
+                admitted = True
+            return None
+        finally:
+            if admitted:
+                self._changed.notify_all()
+
+    def _status(self, name: str, ticket: _Ticket) -> QueueStatus:
+        turn = self._waiting[name].index(ticket)
+        # Sessions ahead in the rotation are served once more than this one before its turn
+        position, ahead = turn + 1, True
+        for other, tickets in self._waiting.items():
+            if other == name:
+                ahead = False
+            else:
+                position += min(len(tickets), turn + 1 if ahead else turn)
+
+        throughputs = []
+        if self.rate:
+            throughputs.append(self.rate)
+        if self.service_seconds:
+            throughputs.append(self.max_concurrent / self.service_seconds)
+        eta = None
+        if throughputs:
+            paused = max(0.0, self._paused_until - time.monotonic())
+            eta = paused + position / min(throughputs)
+        return QueueStatus(position, eta)
+
+    def status(self, name: str) -> Optional[QueueStatus]:
+        """Where the first waiting request of session `name` stands, if it has one"""
+        with self._changed:
+            if tickets := self._waiting.get(name):
+                return self._status(name, tickets[0])
+            return None
+
+    @contextlib.contextmanager
+    def request(self) -> Iterator[None]:
+        """Hold a request slot, waiting in the current session's queue for one if need be"""
+        name, on_wait = current_session()
+        ticket = _Ticket()
+        queued = time.perf_counter()
+        reported = None
+        try:
+            with self._changed:
+                self._waiting.setdefault(name, deque()).append(ticket)
+            while True:
+                with self._changed:
+                    due = self._dispatch()
+                    if ticket.admitted:
+                        break
+                    status = self._status(name, ticket)
+                    if on_wait is None or status.position == reported:
+                        self._changed.wait(min(due or 1.0, 1.0))
+                        continue
+                reported = status.position
+                on_wait(status)
+        except BaseException:
+            with self._changed:
+                if ticket.admitted:
+                    self.running -= 1
+                    self._dispatch()
+                elif ticket in (tickets := self._waiting.get(name, ())):
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del self._waiting[name]
+            raise
+        add_stage("queue", time.perf_counter() - queued)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._changed:
+                self.running -= 1
+                elapsed = time.monotonic() - started
+                self.service_seconds = (
+                    elapsed
+                    if self.service_seconds is None
+                    else 0.8 * self.service_seconds + 0.2 * elapsed
+                )
+                self._dispatch()
+
+    def throttle(self, seconds: float) -> None:
+        """Admit nothing for `seconds`, after Deepgram turned a request away"""
+        with self._changed:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+    def call(self, request: Callable[[], T], retry: bool = True) -> T:
+        """`request()` once admitted, queued again after a pause while it is rate limited"""
+        for attempt in itertools.count(1):
+            with self.request():
+                try:
+                    return request()
+                except Exception as e:
+                    if not is_rate_limited(e):
+                        raise
+                    # Everyone on the key holds off, even if this request can't be sent again
+                    self.throttle(1 + backoff_delay(attempt))
+                    if not retry or attempt > self.max_retries:
+                        raise
+
+    def acquire_live(self) -> bool:
+        """Take a live connection slot if one is free; `release_live()` gives it back"""
+        with self._changed:
+            if self.live >= self.max_live:
+                return False
+            self.live += 1
+            return True
+
+    def release_live(self) -> None:
+        with self._changed:
+            self.live -= 1
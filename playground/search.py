@@ -0,0 +1,169 @@
+"""Full-text search over every transcript the app has produced, in a local SQLite FTS5 index.
+
+Each recording is indexed as segments of up to `SEGMENT_WORDS` consecutive words from
+one channel and speaker, together with the start time of every word, so a hit can be
+resolved to the exact word where the match begins. Phrases spanning two segments are
+not found.
+"""
+
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import time
+from array import array
+from typing import Iterator, List, NamedTuple, Optional
+
+from playground.cache import TranscriptCache
+from playground.results import Word, WordStore, parse_response
+
+SEGMENT_WORDS = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    audio TEXT,
+    indexed REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    text, key UNINDEXED, channel UNINDEXED, speaker UNINDEXED, starts UNINDEXED
+);
+"""
+
+
+class Hit(NamedTuple):
+    key: str
+    name: str
+    audio: Optional[str]
+    channel: int
+    speaker: Optional[int]
+    start: float
+    snippet: str
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _segments(words: WordStore) -> Iterator[List[Word]]:
+    for channel in sorted(set(words.channel)):
+        segment: List[Word] = []
+        for word in words.words(channel):
+            if segment and (word.speaker != segment[0].speaker or len(segment) >= SEGMENT_WORDS):
+                yield segment
+                segment = []
+            segment.append(word)
+        if segment:
+            yield segment
+
+
+def _match_start(text: str, starts: array, query: List[str]) -> float:
+    """Start time of the first word of the segment where the query phrase begins."""
+    words = [_tokens(word) for word in text.split(" ")]
+    for i in range(len(words)):
+        tokens = [token for word in words[i : i + len(query)] for token in word]
+        if tokens[: len(query)] == query:
+            return starts[i]
+    return starts[0]
+
+
+class TranscriptIndex:
+    """Incrementally updated inverted index of transcripts, keyed by transcript cache key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, key: str, name: str, words: WordStore, audio: Optional[str] = None) -> bool:
+        """Index a recording's words, unless already indexed. Returns whether they were added."""
+        with self._connect() as conn:
+            added = conn.execute(
+                "INSERT OR IGNORE INTO recordings VALUES (?, ?, ?, ?)",
+                (key, name, audio, time.time()),
+            ).rowcount
+            if not added:
+                # Already indexed (say, by `sync`): just record what is now known about it
+                conn.execute(
+                    "UPDATE recordings SET name = ?, audio = COALESCE(?, audio) WHERE key = ?",
+                    (name, audio, key),
+                )
+            else:
+                conn.executemany(
+                    "INSERT INTO segments VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (
+                            " ".join(word.text for word in segment),
+                            key,
+                            segment[0].channel,
+                            segment[0].speaker,
+                            array("d", (word.start for word in segment)).tobytes(),
+                        )
+                        for segment in _segments(words)
+                    ),
+                )
+        return bool(added)
+
+    def remove(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM segments WHERE key = ?", (key,))
+            conn.execute("DELETE FROM recordings WHERE key = ?", (key,))
+
+    def search(self, query: str, limit: int = 50) -> List[Hit]:
+        """Segments containing `query` as a phrase, best matches first."""
+        if not (tokens := _tokens(query)):
+            return []
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT segments.key, name, audio, channel, speaker, text, starts,
+                    snippet(segments, 0, '**', '**', '…', 16)
+                FROM segments JOIN recordings ON recordings.key = segments.key
+                WHERE segments MATCH ? ORDER BY rank LIMIT ?
+                """,
+                ('"' + " ".join(tokens) + '"', limit),
+            ).fetchall()
+        hits = []
+        for key, name, audio, channel, speaker, text, starts, snippet in rows:
+            start = _match_start(text, array("d", starts), tokens)
+            hits.append(Hit(key, name, audio, channel, speaker, start, snippet))
+        return hits
+
+    def keys(self) -> List[str]:
+        with self._connect() as conn:
+            return [key for (key,) in conn.execute("SELECT key FROM recordings")]
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            recordings = conn.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+            segments = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {"recordings": recordings, "segments": segments}
+
+
+def sync(index: TranscriptIndex, transcript_cache: TranscriptCache) -> None:
+    """Index cached transcripts missing from the index, and drop those evicted from the cache."""
+    cached = set(transcript_cache.keys())
+    indexed = set(index.keys())
+    for key in indexed - cached:
+        index.remove(key)
+    for key in cached - indexed:
+        if path := transcript_cache.path(key):
+            try:
+                with open(path, "r", encoding="UTF-8") as f:
+                    words = parse_response(json.load(f)).words
+            except (OSError, ValueError, KeyError, IndexError):
+                continue
+            index.add(key, f"Cached transcript {key[:8]}", words)
@@ -0,0 +1,162 @@
+"""Append-only log of finalized live transcription results, as rotated JSONL files.
+
+`append` only queues a record, so the event loop delivering results never waits on disk.
+A background thread writes whatever has queued up in one batch, flushes it, and fsyncs at
+most every `fsync_interval` seconds. A log is a directory of numbered files; a new file is
+started once the current one reaches `max_bytes` or is `max_seconds` old. `LogTail` reads
+a log back while it is being written or afterwards, from this process or any other.
+"""
+
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+END = {"type": "end"}
+
+
+def _files(directory: str) -> List[str]:
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".jsonl"))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, name) for name in names]
+
+
+class SegmentLog:
+    """Writer of one log directory. Call `close()` to write out what is queued and stop."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 8 * 1024 * 1024,
+        max_seconds: float = 3600,
+        fsync_interval: float = 1.0,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.fsync_interval = fsync_interval
+        self._next_file = len(_files(directory))
+        self._file = None
+        self._opened = 0.0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write, name="segment-log", daemon=True)
+        self._thread.start()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self._queue.put(record)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+            self._file.close()
+        self._file = open(os.path.join(self.directory, f"{self._next_file:06d}.jsonl"), "ab")
+        self._opened = time.monotonic()
+        self._next_file += 1
+
+    def _write(self) -> None:
+        synced_at = time.monotonic()
+        unsynced = closing = False
+        while not closing:
+            try:
+                records = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                records = []
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in records:
+                closing = True
+                records = records[: records.index(None)] + [END]
+
+            if records:
+                if (
+                    self._file is None
+                    or self._file.tell() >= self.max_bytes
+                    or time.monotonic() - self._opened >= self.max_seconds
+                ):
+                    self._rotate()
+                self._file.write(
+                    b"".join(
+                        json.dumps(record, separators=(",", ":")).encode() + b"\n"
+                        for record in records
+                    )
+                )
+                self._file.flush()
+                unsynced = True
+            if unsynced and (closing or time.monotonic() - synced_at >= self.fsync_interval):
+                os.fsync(self._file.fileno())
+                synced_at = time.monotonic()
+                unsynced = False
+        if self._file is not None:
+            self._file.close()
+
+
+class LogTail:
+    """Reader returning the records appended to a log since its last read."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.ended = False
+        self.last_record_at: Optional[float] = None
+        self._file = 0
+        self._offset = 0
+
+    def read(self) -> List[Dict[str, Any]]:
+        records = []
+        files = _files(self.directory)
+        while self._file < len(files):
+            with open(files[self._file], "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            # A line still being written is left for the next read
+            complete = data[: data.rfind(b"\n") + 1]
+            self._offset += len(complete)
+            records.extend(json.loads(line) for line in complete.splitlines())
+            if self._file == len(files) - 1:
+                break
+            # Files are only rotated between whole batches, so this one is complete
+            self._file += 1
+            self._offset = 0
+
+        if records:
+            self.last_record_at = time.monotonic()
+        if END in records:
+            self.ended = True
+            records = [record for record in records if record != END]
+        return records
+
+
+def read_bytes(directory: str) -> bytes:
+    """The whole log as one JSONL document"""
+    contents = []
+    for path in _files(directory):
+        with open(path, "rb") as f:
+            contents.append(f.read())
+    return b"".join(contents)
+
+
+def prune(root: str, max_age: float) -> None:
+    """Delete the logs under `root` that haven't been written to for `max_age` seconds."""
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(root):
+        directory = os.path.join(root, name)
+        if not os.path.isdir(directory):
+            continue
+        files = _files(directory)
+        if max(map(os.path.getmtime, files), default=os.path.getmtime(directory)) < cutoff:
+            shutil.rmtree(directory, ignore_errors=True)
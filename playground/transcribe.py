@@ -0,0 +1,287 @@
+"""Cache-aware prerecorded transcription requests, independent of the Streamlit UI."""
+
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from deepgram import PrerecordedOptions
+
+from playground.cache import (
+    TranscriptCache,
+    cache_key,
+    hash_audio,
+    hash_options,
+    normalize_options,
+)
+from playground.client import PooledDeepgramClient
+from playground.metrics import add_stage, stage
+
+if TYPE_CHECKING:
+    from playground.fingerprint import FingerprintIndex
+
+
+class Transcription(NamedTuple):
+    response: Dict[str, Any]
+    cached: bool
+    key: str
+    shared: bool = False
+
+
+class SingleFlight:
+    """Runs one call per key at a time: callers arriving while it runs get its outcome too."""
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, call: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Result of `call()`, or of the call already running for `key`, and whether it was shared"""
+        with self._lock:
+            future = self._calls.get(key)
+            if leader := future is None:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+# Shared by every session, so identical requests from anyone go out once
+_in_flight = SingleFlight()
+
+
+def _fetch(
+    transcript_cache: TranscriptCache,
+    key: str,
+    request: Callable[[], Dict[str, Any]],
+    fingerprints: Optional["FingerprintIndex"] = None,
+) -> Transcription:
+    """Cached response for `key`, or that of the one request in flight for it"""
+    with stage("cache"):
+        response = transcript_cache.get(key)
+    if response is not None:
+        return Transcription(response, True, key)
+
+    def request_and_cache() -> Tuple[Dict[str, Any], bool]:
+        # Missed the cache just before an earlier leader for the key cached its response
+        with stage("cache"):
+            response = transcript_cache.get(key, count_miss=False)
+        if response is not None:
+            return response, True
+        response = request()
+        # Cached before later callers stop waiting on this request
+        with stage("cache"):
+            evicted = transcript_cache.put(key, response)
+        # Fingerprints of evicted audio would only lead to transcripts no longer there
+        if fingerprints is not None:
+            for evicted_key in evicted:
+                fingerprints.remove(evicted_key)
+        return response, False
+
+    started = time.perf_counter()
+    (response, cached), shared = _in_flight.do(key, request_and_cache)
+    if shared:
+        add_stage("in_flight", time.perf_counter() - started)
+    # Realigned from a near-duplicate recording: no request of its own either
+    reused = cached or shared or "near_duplicate_of" in response.get("metadata", {})
+    return Transcription(response, reused, key, shared)
+
+
+def source_digest(source: dict, transcript_cache: TranscriptCache) -> str:
+    """Content hash identifying the audio behind a `url`, `download`, `path` or `buffer` source"""
+    if "url" in source:
+        return hashlib.sha256(f"url:{source['url']}".encode()).hexdigest()
+    if "download" in source:
+        # Still being downloaded, so identified by what is downloaded rather than its bytes
+        return hashlib.sha256(f"download:{source['download'].key}".encode()).hexdigest()
+    if "path" in source:
+        return transcript_cache.hash_file(source["path"])
+
+    buffer = source["buffer"]
+    if isinstance(buffer, (bytes, bytearray, io.BytesIO)):
+        return hash_audio(buffer)
+    if os.path.isfile(getattr(buffer, "name", "")):
+        return transcript_cache.hash_file(buffer.name)
+    return hash_audio(buffer)
+
+
+def shared_source(source: dict) -> Callable[[], dict]:
+    """Factory of copies of `source` that concurrent requests can each read on their own.
+
+    A file-like buffer is read into memory once and shared by every copy. URLs, local paths
+    and downloads can already be opened by several requests at once.
+    """
+    buffer = source.get("buffer")
+    if not hasattr(buffer, "read"):
+        return lambda: source
+    buffer.seek(0)
+    data = buffer.read()
+    return lambda: {"buffer": io.BytesIO(data)}
+
+
+@contextlib.contextmanager
+def open_source(source: dict) -> Iterator[dict]:
+    """Request payload for `source` that streams file contents instead of reading them whole.
+
+    Local files are opened here and closed when the context exits, even if the request fails.
+    File-like buffers are rewound and sent as a stream, so retries send the full audio.
+    In-progress downloads are sent as they arrive, using chunked transfer encoding.
+    """
+    if "download" in source:
+        chunks = source["download"].iter_chunks()
+        try:
+            yield {"stream": chunks}
+        finally:
+            chunks.close()
+    elif "path" in source:
+        with open(source["path"], "rb") as f:
+            yield {"stream": f}
+    elif hasattr(source.get("buffer"), "read"):
+        source["buffer"].seek(0)
+        yield {"stream": source["buffer"]}
+    else:
+        yield source
+
+
+def transcribe(
+    deepgram: PooledDeepgramClient,
+    source: dict,
+    options: PrerecordedOptions,
+    transcript_cache: TranscriptCache,
+    audio_digest: str,
+    preprocess: Optional[str] = None,
+    chunk_seconds: Optional[float] = None,
+    max_in_flight: int = 4,
+    fingerprints: Optional["FingerprintIndex"] = None,
+) -> Transcription:
+    """Transcribe `source`, serving from the cache when possible.
+
+    With `preprocess` set to one of `audio.CODECS`, local audio that can be decoded is
+    downmixed to mono (unless `multichannel` is set), resampled down to at most 16 kHz and
+    compressed before upload, and the `encoding` and `sample_rate` options are set to match.
+    The original is sent instead when that doesn't make it smaller.
+
+    With `chunk_seconds` set, decodable audio longer than that is split at silences into
+    chunks of about that length, which are transcribed `max_in_flight` at a time and
+    merged back into a single response.
+
+    With `fingerprints`, decodable audio that is a re-encoded or trimmed copy of audio
+    already transcribed with the same options reuses that transcript, realigned to it,
+    instead of being sent. Audio that is sent is fingerprinted for later requests.
+
+    Requests are keyed on the audio and normalized options, so options that give the same
+    result share a cache entry, and concurrent identical requests are sent only once.
+
+    Returns the response, whether it was served without a request of its own (from the cache,
+    a near-duplicate, or `shared` with an identical request in flight), and its cache key.
+    """
+    if "url" in source:
+        key = cache_key(audio_digest, options)
+        return _fetch(
+            transcript_cache,
+            key,
+            functools.partial(deepgram.transcribe_url, source, options),
+            fingerprints,
+        )
+
+    with contextlib.ExitStack() as stack:
+        payload = stack.enter_context(open_source(source))
+        info = None
+        if (preprocess or chunk_seconds or fingerprints) and "download" not in source:
+            # numpy and soundfile are only loaded once audio is processed locally. Audio still
+            # downloading, or in formats libsndfile can't decode, is sent as-is
+            from playground.audio import (
+                preprocessed,
+                probe,
+                stream_size,
+                target_sample_rate,
+            )
+            from playground.chunking import transcribe_chunks
+
+            audio = payload["stream"] if "stream" in payload else payload["buffer"]
+            if isinstance(audio, (bytes, bytearray)):
+                audio = io.BytesIO(audio)
+            with stage("read"):
+                info = probe(audio)
+
+        preprocess = preprocess if info else None
+        original_options = options
+        if preprocess:
+            sample_rate = target_sample_rate(preprocess, info.samplerate)
+            options = dataclasses.replace(options, encoding=preprocess, sample_rate=sample_rate)
+        chunked = bool(info and chunk_seconds and info.duration > chunk_seconds * 1.25)
+
+        request_options = (
+            {"options": normalize_options(options), "chunk_seconds": chunk_seconds}
+            if chunked
+            else options
+        )
+        key = cache_key(audio_digest, request_options)
+
+        def send() -> Dict[str, Any]:
+            if chunked:
+                return transcribe_chunks(
+                    deepgram,
+                    audio,
+                    options,
+                    chunk_seconds,
+                    codec=preprocess or "flac",
+                    sample_rate=sample_rate if preprocess else None,
+                    max_in_flight=max_in_flight,
+                )
+            if not preprocess:
+                return deepgram.transcribe_file(payload, options)
+            with stage("preprocess"):
+                encoded = stack.enter_context(
+                    preprocessed(audio, preprocess, not options.multichannel, sample_rate)
+                )
+            if stream_size(encoded) < stream_size(audio):
+                return deepgram.transcribe_file({"stream": encoded}, options)
+            # Audio that is compact already, like 8 kHz µ-law, can come out bigger
+            audio.seek(0)
+            return deepgram.transcribe_file(payload, original_options)
+
+        def request() -> Dict[str, Any]:
+            if fingerprints is None or not info:
+                return send()
+            from playground.fingerprint import fingerprint_audio, realign
+
+            options_hash = hash_options(request_options)
+            with stage("fingerprint"):
+                fingerprint = fingerprint_audio(audio)
+                match = fingerprints.match(options_hash, fingerprint)
+            if match:
+                if (matched := transcript_cache.get(match.key)) is not None:
+                    return realign(matched, match, fingerprint.duration)
+                fingerprints.remove(match.key)
+            response = send()
+            fingerprints.add(key, options_hash, fingerprint)
+            return response
+
+        return _fetch(transcript_cache, key, request, fingerprints)
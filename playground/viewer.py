@@ -0,0 +1,83 @@
+"""Views of large responses that only serialize what is on screen."""
+
+from array import array
+from typing import Any, List, Sequence, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from playground.results import NO_SPEAKER, WordStore
+
+PAGE_SIZE = 50
+PREVIEW_ITEMS = 3
+
+Path = Sequence[Union[str, int]]
+
+
+def resolve(response: Any, path: Path) -> Any:
+    """The value at `path` (a sequence of keys and list indices) in `response`."""
+    node = response
+    for step in path:
+        node = node[step]
+    return node
+
+
+def is_container(value: Any) -> bool:
+    return isinstance(value, (dict, list))
+
+
+def preview(value: Any, depth: int = 1, max_items: int = PREVIEW_ITEMS) -> Any:
+    """Copy of `value` down to `depth` levels, and only the first `max_items` of each list.
+
+    Anything deeper or further down a list is replaced by a short description, so the
+    preview of a node costs about the same however large the node is.
+    """
+    if isinstance(value, dict):
+        if depth <= 0:
+            return f"{{…}} {len(value)} keys"
+        return {key: preview(item, depth - 1, max_items) for key, item in value.items()}
+    if isinstance(value, list):
+        if depth <= 0:
+            return f"[…] {len(value)} items"
+        items = [preview(item, depth - 1, max_items) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"… {len(value) - max_items} more items")
+        return items
+    return value
+
+
+def page_count(node: Any, page_size: int = PAGE_SIZE) -> int:
+    return max(1, -(-len(node) // page_size)) if is_container(node) else 1
+
+
+def page(node: Any, number: int, page_size: int = PAGE_SIZE) -> List[Tuple[Union[str, int], Any]]:
+    """`(key, value)` pairs of the children of `node` on the given (1-based) page."""
+    start = (number - 1) * page_size
+    if isinstance(node, dict):
+        keys = list(node)[start : start + page_size]
+        return [(key, node[key]) for key in keys]
+    if isinstance(node, list):
+        return list(enumerate(node[start : start + page_size], start=start))
+    return []
+
+
+def _column(values: array, type: pa.DataType) -> pa.Array:
+    # Zero-copy view of the store's array
+    return pa.Array.from_buffers(type, len(values), [None, pa.py_buffer(values)])
+
+
+def word_table(words: WordStore) -> pa.Table:
+    """The word store as an Arrow table, sharing its numeric columns' memory."""
+    speaker = _column(words.speaker, pa.int32())
+    return pa.table(
+        {
+            "word": pa.array(words.text, pa.string()),
+            "start": _column(words.start, pa.float64()),
+            "end": _column(words.end, pa.float64()),
+            "confidence": _column(words.confidence, pa.float64()),
+            "speaker": pc.if_else(
+                pc.equal(speaker, NO_SPEAKER), pa.scalar(None, pa.int32()), speaker
+            ),
+            "channel": _column(words.channel, pa.uint16()),
+        }
+    )
@@ -0,0 +1,143 @@
+"""Streaming, de-duplicated YouTube audio ingestion."""
+
+import atexit
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+from pytube import YouTube, extract, request
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SharedDownload:
+    """A download written to disk in the background while any number of readers stream it.
+
+    Readers follow the file as it grows, so transcription can start with the first chunk
+    instead of waiting for the whole download.
+    """
+
+    def __init__(self, key: str, path: str, chunks: Iterable[bytes], mime_type: str):
+        self.key = key
+        self.path = path
+        self.mime_type = mime_type
+        self.size = 0
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.sessions: Set[str] = set()
+        self.last_used = time.monotonic()
+        self._condition = threading.Condition()
+        open(path, "wb").close()
+        threading.Thread(
+            target=self._download, args=(chunks,), name=f"download-{key}", daemon=True
+        ).start()
+
+    def _download(self, chunks: Iterable[bytes]) -> None:
+        try:
+            with open(self.path, "ab") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    f.flush()
+                    with self._condition:
+                        self.size += len(chunk)
+                        self._condition.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._condition:
+                self.done = True
+                self._condition.notify_all()
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield the audio as it arrives, finishing when the download does."""
+        position = 0
+        with open(self.path, "rb") as f:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self.size > position or self.done)
+                    size, done = self.size, self.done
+                if self.error:
+                    raise self.error
+                if position < size:
+                    data = f.read(min(chunk_size, size - position))
+                    position += len(data)
+                    yield data
+                elif done:
+                    return
+
+
+class YouTubeIngest:
+    """Process-wide registry of YouTube audio downloads, one per video ID.
+
+    Sessions asking for the same video share a single download. A session holds at most
+    one video at a time; files nobody holds are removed after `grace` seconds, and files
+    whose sessions have gone quiet for `ttl` seconds are removed regardless. Expired files
+    are swept every `sweep_interval` seconds.
+    """
+
+    def __init__(self, grace: float = 10 * 60, ttl: float = 60 * 60, sweep_interval: float = 60):
+        self.grace = grace
+        self.ttl = ttl
+        self.directory = tempfile.mkdtemp(prefix="deepgram-playground-youtube-")
+        atexit.register(shutil.rmtree, self.directory, ignore_errors=True)
+        self._downloads: Dict[str, SharedDownload] = {}
+        self._lock = threading.Lock()
+        threading.Thread(
+            target=self._sweep, args=(sweep_interval,), name="youtube-sweep", daemon=True
+        ).start()
+
+    def _hold(self, download: SharedDownload, session_id: str) -> None:
+        for other in self._downloads.values():
+            other.sessions.discard(session_id)
+        download.sessions.add(session_id)
+        download.last_used = time.monotonic()
+
+    def acquire(self, url: str, session_id: str) -> SharedDownload:
+        video_id = extract.video_id(url)
+        with self._lock:
+            download = self._downloads.get(video_id)
+            if download is not None and not download.error:
+                self._hold(download, session_id)
+                return download
+
+        # Looking the stream up is a network round trip, which other sessions don't wait on
+        stream = YouTube(url).streams.filter(only_audio=True).first()
+        with self._lock:
+            download = self._downloads.get(video_id)
+            # Unless another session started the same video in the meantime
+            if download is None or download.error:
+                download = SharedDownload(
+                    video_id,
+                    os.path.join(self.directory, f"{video_id}.{stream.subtype}"),
+                    request.stream(stream.url),
+                    stream.mime_type,
+                )
+                self._downloads[video_id] = download
+            self._hold(download, session_id)
+        return download
+
+    def _sweep(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove the files of downloads nobody is using anymore"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                self._downloads.pop(video_id)
+                for video_id, download in list(self._downloads.items())
+                if download.done
+                and (
+                    now - download.last_used > self.ttl
+                    or (not download.sessions and now - download.last_used > self.grace)
+                )
+            ]
+        for download in expired:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(download.path)
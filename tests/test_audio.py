@@ -0,0 +1,83 @@
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+from deepgram import PrerecordedOptions
+
+from playground.audio import preprocessed, target_sample_rate
+from playground.cache import TranscriptCache
+from playground.transcribe import transcribe
+
+
+class RecordingClient:
+    """Stands in for the Deepgram client, keeping what each request would upload"""
+
+    def __init__(self):
+        self.uploads = []
+
+    def transcribe_file(self, payload, options):
+        stream = payload.get("stream")
+        data = stream.read() if stream is not None else payload["buffer"]
+        self.uploads.append((data, options))
+        return {"metadata": {"duration": 1.0}, "results": {"channels": []}}
+
+
+def _wav(rate: int, subtype: str, seconds: float = 60) -> bytes:
+    t = np.arange(int(rate * seconds)) / rate
+    rng = np.random.default_rng(0)
+    signal = 0.3 * np.sin(2 * np.pi * 300 * t) * (1 + np.sin(2 * np.pi * 3 * t))
+    signal += 0.05 * rng.standard_normal(len(t))
+    output = io.BytesIO()
+    sf.write(output, signal.astype(np.float32), rate, format="WAV", subtype=subtype)
+    return output.getvalue()
+
+
+def test_target_sample_rate_never_upsamples():
+    assert target_sample_rate("flac", 44100) == 16000
+    assert target_sample_rate("flac", 8000) == 8000
+    assert target_sample_rate("flac", 11025) == 11025
+    # Opus only encodes at some rates
+    assert target_sample_rate("opus", 11025) == 12000
+    assert target_sample_rate("opus", 48000) == 16000
+
+
+def test_preprocessed_keeps_a_lower_source_rate():
+    with preprocessed(io.BytesIO(_wav(8000, "PCM_16", 5)), "flac", True, 8000) as encoded:
+        info = sf.info(encoded)
+    assert (info.samplerate, info.frames) == (8000, 40000)
+
+
+def _transcribe(tmp_path, audio: bytes):
+    client = RecordingClient()
+    transcribe(
+        client,
+        {"buffer": io.BytesIO(audio)},
+        PrerecordedOptions(model="nova-2"),
+        TranscriptCache(str(tmp_path), max_bytes=1 << 30, ttl=60),
+        "digest",
+        preprocess="flac",
+    )
+    return client.uploads[0]
+
+
+def test_narrowband_audio_is_compressed_at_its_own_rate(tmp_path):
+    audio = _wav(8000, "PCM_16")
+    upload, options = _transcribe(tmp_path, audio)
+    assert len(upload) < len(audio)
+    assert (options.encoding, options.sample_rate) == ("flac", 8000)
+    assert sf.info(io.BytesIO(upload)).samplerate == 8000
+
+
+def test_original_is_sent_when_compression_does_not_help(tmp_path):
+    audio = _wav(8000, "ULAW")
+    upload, options = _transcribe(tmp_path, audio)
+    assert upload == audio
+    assert options.encoding is None and options.sample_rate is None
+
+
+@pytest.mark.parametrize("rate", [16000, 44100])
+def test_wideband_audio_is_resampled_to_16_khz(tmp_path, rate):
+    upload, options = _transcribe(tmp_path, _wav(rate, "PCM_16", 10))
+    assert options.sample_rate == 16000
+    assert sf.info(io.BytesIO(upload)).samplerate == 16000
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from playground import cache
+from playground.cache import TranscriptCache, hash_audio
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+
+def _response(size: int) -> dict:
+    return {"results": {"channels": []}, "padding": "x" * size}
+
+
+def test_round_trip_and_stats(tmp_path):
+    transcripts = TranscriptCache(str(tmp_path), max_bytes=1 << 20, ttl=60)
+    assert transcripts.get("a" * 64) is None
+    transcripts.put("a" * 64, _response(10))
+    assert transcripts.get("a" * 64) == _response(10)
+    stats = transcripts.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_expired_entries_are_dropped(tmp_path, clock):
+    transcripts = TranscriptCache(str(tmp_path), max_bytes=1 << 20, ttl=60)
+    transcripts.put("a" * 64, _response(10))
+    clock[0] += 61
+    assert transcripts.get("a" * 64) is None
+    assert transcripts.keys() == []
+    assert transcripts.path("a" * 64) is None
+
+
+def test_expired_entries_are_evicted_on_put(tmp_path, clock):
+    transcripts = TranscriptCache(str(tmp_path), max_bytes=1 << 20, ttl=60)
+    transcripts.put("a" * 64, _response(10))
+    clock[0] += 61
+    assert transcripts.put("b" * 64, _response(10)) == ["a" * 64]
+    assert transcripts.keys() == ["b" * 64]
+    assert transcripts.stats()["evictions"] == 1
+
+
+def test_least_recently_used_is_evicted_first(tmp_path, clock):
+    transcripts = TranscriptCache(str(tmp_path), max_bytes=2500, ttl=60)
+    for key in "abc":
+        transcripts.put(key * 64, _response(1000))
+        clock[0] += 1
+    # Three entries don't fit: the oldest goes, unless it was read since
+    assert sorted(transcripts.keys()) == ["b" * 64, "c" * 64]
+
+    transcripts.get("b" * 64)
+    clock[0] += 1
+    assert transcripts.put("d" * 64, _response(1000)) == ["c" * 64]
+    assert sorted(transcripts.keys()) == ["b" * 64, "d" * 64]
+
+
+def test_failed_put_leaves_no_temporary_file(tmp_path):
+    transcripts = TranscriptCache(str(tmp_path), max_bytes=1 << 20, ttl=60)
+    with pytest.raises(TypeError):
+        transcripts.put("a" * 64, {"not json": object()})
+    assert os.listdir(tmp_path / "aa") == []
+    assert transcripts.keys() == []
+
+
+def test_hash_file_matches_contents(tmp_path):
+    audio = tmp_path / "audio.wav"
+    audio.write_bytes(b"RIFF" * 1000)
+    transcripts = TranscriptCache(str(tmp_path / "cache"), max_bytes=1 << 20, ttl=60)
+    assert transcripts.hash_file(str(audio)) == hash_audio(b"RIFF" * 1000)
+    # Memoized, and invalidated when the file changes
+    assert transcripts.hash_file(str(audio)) == hash_audio(b"RIFF" * 1000)
+    audio.write_bytes(b"OggS" * 1001)
+    assert transcripts.hash_file(str(audio)) == hash_audio(b"OggS" * 1001)
+
+
+def test_file_digests_are_forgotten_with_evicted_transcripts(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(cache, "MAX_FILE_DIGESTS", 2)
+    transcripts = TranscriptCache(str(tmp_path / "cache"), max_bytes=1 << 20, ttl=60)
+    for name in "abc":
+        (tmp_path / name).write_bytes(name.encode() * 100)
+        transcripts.hash_file(str(tmp_path / name))
+        clock[0] += 1
+    transcripts.put("a" * 64, _response(10))
+    # Only the two used last are kept
+    assert transcripts.stats()["file_digests"] == 2
+
+    clock[0] += 30
+    transcripts.hash_file(str(tmp_path / "c"))
+    clock[0] += 31
+    transcripts.put("b" * 64, _response(10))
+    # "b" went unused for longer than the TTL
+    assert transcripts.stats()["file_digests"] == 1
@@ -0,0 +1,131 @@
+import io
+import threading
+
+import numpy as np
+import pytest
+import soundfile as sf
+from deepgram import PrerecordedOptions
+
+from playground.chunking import (
+    OVERLAP_SECONDS,
+    frame_energy,
+    merge_responses,
+    split_points,
+    transcribe_chunks,
+)
+
+
+def _response(words, duration):
+    """Response with one channel of (word, start, speaker) tuples"""
+    return {
+        "metadata": {"duration": duration},
+        "results": {
+            "channels": [
+                {
+                    "alternatives": [
+                        {
+                            "transcript": " ".join(word for word, _, _ in words),
+                            "confidence": 0.9,
+                            "words": [
+                                {
+                                    "word": word,
+                                    "start": start,
+                                    "end": start + 0.5,
+                                    "confidence": 0.9,
+                                    "speaker": speaker,
+                                }
+                                for word, start, speaker in words
+                            ],
+                        }
+                    ]
+                }
+            ]
+        },
+    }
+
+
+def test_merge_shifts_words_and_drops_the_overlap():
+    first = _response([("one", 1.0, 0), ("two", 8.0, 0), ("three", 9.0, 0)], 10.0)
+    # Starts 3 s before the boundary at 10 s, so "two" and "three" are transcribed twice
+    second = _response([("two", 1.0, 0), ("three", 2.0, 0), ("four", 4.0, 0)], 6.0)
+    merged = merge_responses([first, second], [0.0, 7.0], [0.0, 10.0, float("inf")])
+
+    alternative = merged["results"]["channels"][0]["alternatives"][0]
+    assert [(w["word"], w["start"]) for w in alternative["words"]] == [
+        ("one", 1.0),
+        ("two", 8.0),
+        ("three", 9.0),
+        ("four", 11.0),
+    ]
+    assert alternative["transcript"] == "one two three four"
+    assert merged["metadata"]["duration"] == 13.0
+    # The chunks aren't modified
+    assert second["results"]["channels"][0]["alternatives"][0]["words"][2]["start"] == 4.0
+
+
+def test_merge_relabels_speakers_by_the_overlap():
+    first = _response([("hi", 1.0, 0), ("hello", 8.0, 1), ("there", 9.0, 0)], 10.0)
+    # The second chunk numbers the same two speakers the other way round, and adds a third
+    second = _response(
+        [("hello", 1.0, 0), ("there", 2.0, 1), ("bye", 4.0, 0), ("ciao", 5.0, 1), ("yo", 5.5, 2)],
+        6.0,
+    )
+    merged = merge_responses([first, second], [0.0, 7.0], [0.0, 10.0, float("inf")])
+
+    words = merged["results"]["channels"][0]["alternatives"][0]["words"]
+    assert [(w["word"], w["speaker"]) for w in words] == [
+        ("hi", 0),
+        ("hello", 1),
+        ("there", 0),
+        ("bye", 1),
+        ("ciao", 0),
+        ("yo", 2),
+    ]
+
+
+def test_split_points_fall_on_silences():
+    energy = np.ones(1000)  # 30 s of 30 ms frames
+    energy[320] = energy[690] = 0  # silences at 9.6 s and 20.7 s
+    points = split_points(energy, chunk_seconds=10, search_seconds=2)
+    assert np.allclose(points, [9.6, 20.7])
+
+
+def _noise(seconds: float, rate: int = 8000) -> io.BytesIO:
+    audio = io.BytesIO()
+    samples = np.random.default_rng(0).uniform(-0.5, 0.5, int(seconds * rate))
+    sf.write(audio, samples.astype(np.float32), rate, format="WAV", subtype="PCM_16")
+    audio.seek(0)
+    return audio
+
+
+class ChunkClient:
+    """Stands in for the Deepgram client, keeping the length of each chunk sent"""
+
+    def __init__(self):
+        self.durations = []
+        self._lock = threading.Lock()
+
+    def transcribe_file(self, payload, options):
+        duration = sf.info(payload["stream"]).duration
+        with self._lock:
+            self.durations.append(duration)
+        return _response([], duration)
+
+
+def test_frame_energy_covers_only_the_audio():
+    # 17.55 s is not a whole number of 30 s blocks
+    with sf.SoundFile(_noise(17.55)) as reader:
+        assert len(frame_energy(reader)) == 585
+
+
+def test_chunks_end_with_audio_of_their_own():
+    client = ChunkClient()
+    options = PrerecordedOptions(model="nova-2")
+    merged = transcribe_chunks(client, _noise(130), options, chunk_seconds=60)
+    durations = sorted(client.durations)
+    assert len(durations) == 2
+    assert sum(durations) == pytest.approx(130 + OVERLAP_SECONDS, abs=0.1)
+    # No chunk is overlap alone, or much longer than asked for
+    assert durations[0] > OVERLAP_SECONDS + 15
+    assert durations[-1] <= 60 * 1.25 + OVERLAP_SECONDS
+    assert merged["metadata"]["duration"] == pytest.approx(130, abs=0.1)
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from playground import compare
+from playground.compare import align, normalize, word_errors
+
+
+def _distance(a, b) -> int:
+    """Edit distance from the textbook table, to check alignments against"""
+    table = [[i + j if not i or not j else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            table[i][j] = min(
+                table[i - 1][j - 1] + (a[i - 1] != b[j - 1]),
+                table[i - 1][j] + 1,
+                table[i][j - 1] + 1,
+            )
+    return table[-1][-1]
+
+
+def _check(reference, hypothesis) -> None:
+    edits = align(reference, hypothesis)
+    errors = word_errors(edits)
+    assert errors.substitutions + errors.deletions + errors.insertions == _distance(
+        reference, hypothesis
+    )
+    # The edits walk both transcripts in order, and turn one into the other
+    assert [e.reference for e in edits if e.reference is not None] == list(range(len(reference)))
+    assert [e.hypothesis for e in edits if e.hypothesis is not None] == list(range(len(hypothesis)))
+    for edit in edits:
+        if edit.op == "equal":
+            assert reference[edit.reference] == hypothesis[edit.hypothesis]
+        elif edit.op == "substitute":
+            assert reference[edit.reference] != hypothesis[edit.hypothesis]
+
+
+def _pairs(count: int):
+    rng = random.Random(0)
+    for _ in range(count):
+        reference = rng.choices("abcd", k=rng.randint(0, 30))
+        hypothesis = list(reference)
+        for _ in range(rng.randint(0, 8)):
+            position = rng.randint(0, len(hypothesis))
+            edit = rng.choice(["insert", "delete", "substitute"])
+            if edit == "insert":
+                hypothesis.insert(position, rng.choice("abcde"))
+            elif hypothesis and position < len(hypothesis):
+                if edit == "delete":
+                    del hypothesis[position]
+                else:
+                    hypothesis[position] = rng.choice("abcde")
+        yield reference, hypothesis
+
+
+def test_alignment_is_minimal():
+    for reference, hypothesis in _pairs(200):
+        _check(reference, hypothesis)
+
+
+def test_split_alignment_is_minimal(monkeypatch):
+    # Tables of more than a few cells are split in half, recursively
+    monkeypatch.setattr(compare, "FULL_CELLS", 16)
+    for reference, hypothesis in _pairs(200):
+        _check(reference, hypothesis)
+
+
+def test_word_error_rate():
+    reference = normalize("The cat sat on the mat.".split())
+    hypothesis = normalize("the cat sat on a mat today".split())
+    errors = word_errors(align(reference, hypothesis))
+    assert errors == (1, 0, 1, 6)
+    assert errors.rate == pytest.approx(2 / 6)
+    assert word_errors(align([], [])).rate == 0
+    assert word_errors(align([], ["hello"])).rate == 1
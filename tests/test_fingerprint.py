@@ -0,0 +1,73 @@
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from playground.audio import Resampler
+from playground.cache import TranscriptCache
+from playground.fingerprint import FingerprintIndex, fingerprint_audio, prune
+
+RATE = 16000
+
+
+def _tones(seed: int, seconds: float) -> np.ndarray:
+    """A new chord of three tones every 100 ms, at random pitches and levels"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(RATE // 10) / RATE
+    return np.concatenate(
+        [
+            sum(
+                level * np.sin(2 * np.pi * pitch * t)
+                for pitch, level in zip(rng.uniform(200, 3500, 3), rng.uniform(0.05, 0.3, 3))
+            )
+            for _ in range(int(seconds * 10))
+        ]
+    ).astype(np.float32)
+
+
+def _fingerprint(samples: np.ndarray, rate: int = RATE):
+    output = io.BytesIO()
+    sf.write(output, samples, rate, format="WAV", subtype="PCM_16")
+    return fingerprint_audio(output)
+
+
+@pytest.fixture(scope="module")
+def recording() -> np.ndarray:
+    return _tones(1, 60)
+
+
+@pytest.fixture
+def index(tmp_path, recording) -> FingerprintIndex:
+    index = FingerprintIndex(str(tmp_path / "fingerprints.sqlite3"))
+    index.add("a" * 64, "options", _fingerprint(recording))
+    return index
+
+
+def test_trimmed_and_resampled_copy_matches(index, recording):
+    trimmed = recording[5 * RATE : 35 * RATE, None]
+    copy = Resampler(RATE, 8000, 1).process(trimmed)[:, 0]
+    match = index.match("options", _fingerprint(copy, 8000))
+    assert match is not None
+    assert match.key == "a" * 64
+    assert match.offset == pytest.approx(5.0, abs=0.02)
+
+
+def test_other_options_or_audio_do_not_match(index, recording):
+    assert index.match("other options", _fingerprint(recording)) is None
+    assert index.match("options", _fingerprint(_tones(2, 30))) is None
+
+
+def test_shared_prefix_does_not_match(index, recording):
+    # Only the first 12 of 42 s are in the indexed recording, though all 42 s fit within it
+    query = np.concatenate([recording[: 12 * RATE], _tones(2, 30)])
+    assert index.match("options", _fingerprint(query)) is None
+
+
+def test_prune_drops_fingerprints_of_evicted_transcripts(tmp_path, index, recording):
+    transcripts = TranscriptCache(str(tmp_path / "transcripts"), max_bytes=1 << 20, ttl=60)
+    transcripts.put("b" * 64, {"results": {"channels": []}})
+    index.add("b" * 64, "options", _fingerprint(_tones(3, 10)))
+    prune(index, transcripts)
+    assert index.keys() == ["b" * 64]
+    assert index.match("options", _fingerprint(recording)) is None
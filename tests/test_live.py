@@ -0,0 +1,14 @@
+from playground.live import ChunkSource, LiveFeed
+
+
+def test_chunks_the_connection_fell_behind_on_are_dropped_and_counted():
+    source = ChunkSource("Microphone", chunk_size=2, max_chunks=2)
+    feed = LiveFeed(source, max_utterances=10)
+    source.write(b"aabbcc")
+    assert feed.dropped == 1
+    assert feed.health()["Dropped chunks"] == 1
+    assert [source.read(0), source.read(0)] == [b"bb", b"cc"]
+
+    source.close()
+    assert source.read(0) is None
+    assert LiveFeed("https://example.com/stream", max_utterances=10).dropped == 0
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+from deepgram import DeepgramApiError
+
+from playground.batch import BatchTranscriber
+from playground.scheduler import Scheduler, session
+
+
+def _queued(scheduler: Scheduler) -> int:
+    return sum(len(tickets) for tickets in scheduler._waiting.values())
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_sessions_take_turns():
+    scheduler = Scheduler(max_concurrent=1)
+    release = threading.Event()
+    order = []
+
+    def call(name: str, label: str) -> None:
+        with session(name):
+            scheduler.call(lambda: order.append(label))
+
+    blocker = threading.Thread(target=lambda: scheduler.call(lambda: release.wait(5)), daemon=True)
+    blocker.start()
+    _wait_for(lambda: scheduler.running == 1)
+
+    threads = []
+    for name, label in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")]:
+        threads.append(threading.Thread(target=call, args=(name, label), daemon=True))
+        threads[-1].start()
+        _wait_for(lambda: _queued(scheduler) == len(threads))
+    # Session b queued last, behind three requests of a, but is next after a's first
+    assert scheduler.status("b").position == 2
+
+    release.set()
+    for thread in [blocker] + threads:
+        thread.join(5)
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+@pytest.fixture
+def rate_limited(monkeypatch):
+    """A scheduler that never actually pauses, and a request Deepgram always turns away"""
+    scheduler = Scheduler(max_retries=3)
+    pauses = []
+    monkeypatch.setattr(scheduler, "throttle", pauses.append)
+    calls = []
+
+    def request():
+        calls.append(1)
+        raise DeepgramApiError("Too many requests", "429")
+
+    return scheduler, request, calls, pauses
+
+
+def test_rate_limited_requests_are_retried_by_the_scheduler_alone(rate_limited):
+    scheduler, request, calls, pauses = rate_limited
+    batch = BatchTranscriber(lambda source: (scheduler.call(request), False), max_attempts=4)
+    [result] = batch.run([("audio", {})])
+    assert isinstance(result.error, DeepgramApiError)
+    assert result.attempts == 1
+    assert len(calls) == 1 + scheduler.max_retries
+    assert len(pauses) == len(calls)
+
+
+def test_requests_that_cannot_be_retried_still_pause_the_key(rate_limited):
+    scheduler, request, calls, pauses = rate_limited
+    with pytest.raises(DeepgramApiError):
+        scheduler.call(request, retry=False)
+    assert len(calls) == len(pauses) == 1
@@ -0,0 +1,109 @@
+import threading
+
+from deepgram import PrerecordedOptions
+
+from playground.cache import TranscriptCache, cache_key, hash_options, normalize_options
+from playground.transcribe import SingleFlight, transcribe
+
+RESPONSE = {"metadata": {"duration": 1.0}, "results": {"channels": []}}
+
+
+def test_equivalent_options_hash_the_same():
+    base = PrerecordedOptions(model="nova-2", smart_format=True)
+    assert hash_options(base) == hash_options(
+        PrerecordedOptions(
+            model="nova-2", smart_format=True, punctuate=True, paragraphs=True, diarize=False
+        )
+    )
+    # Unset, empty or irrelevant settings
+    assert hash_options(PrerecordedOptions(model="nova-2")) == hash_options(
+        PrerecordedOptions(model="nova-2", redact=[], search="[]", utt_split=0.8)
+    )
+    assert hash_options(PrerecordedOptions(redact=["ssn", "pci"])) == hash_options(
+        PrerecordedOptions(redact=["pci", "ssn", "pci"])
+    )
+    # Plain dicts too, and the same as the options object they spell out
+    assert hash_options({"model": "nova-2", "smart_format": True}) == hash_options(
+        {"model": "nova-2", "smart_format": True, "punctuate": True, "diarize": False, "redact": []}
+    )
+    assert hash_options({"model": "nova-2", "smart_format": True}) == hash_options(base)
+
+
+def test_different_options_hash_differently():
+    assert hash_options(PrerecordedOptions(model="nova-2")) != hash_options(
+        PrerecordedOptions(model="nova")
+    )
+    assert hash_options(PrerecordedOptions(utterances=True, utt_split=0.8)) != hash_options(
+        PrerecordedOptions(utterances=True, utt_split=1.2)
+    )
+    assert normalize_options(PrerecordedOptions(model="nova-2", punctuate=True)) == {
+        "model": "nova-2",
+        "punctuate": True,
+    }
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", call)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.do("key", call)))
+    follower.start()
+    release.set()
+    leader.join()
+    follower.join()
+    assert len(calls) == 1
+    assert sorted(results) == [("result", False), ("result", True)]
+
+
+class Client:
+    def __init__(self):
+        self.requests = 0
+
+    def transcribe_url(self, source, options):
+        self.requests += 1
+        return RESPONSE
+
+
+class StaleCache(TranscriptCache):
+    """Misses on the first lookup, as if an earlier leader cached the response just after it"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lookups = 0
+
+    def get(self, key, count_miss=True):
+        self.lookups += 1
+        return None if self.lookups == 1 else super().get(key, count_miss)
+
+
+def test_late_caller_uses_the_response_cached_meanwhile(tmp_path):
+    options = PrerecordedOptions(model="nova-2")
+    transcripts = StaleCache(str(tmp_path), 1 << 20, 60)
+    transcripts.put(cache_key("digest", options), RESPONSE)
+    client = Client()
+
+    transcription = transcribe(client, {"url": "https://x"}, options, transcripts, "digest")
+    assert client.requests == 0
+    assert transcription.cached and transcription.response == RESPONSE
+
+
+def test_responses_are_cached(tmp_path):
+    options = PrerecordedOptions(model="nova-2")
+    transcripts = TranscriptCache(str(tmp_path), 1 << 20, 60)
+    client = Client()
+    first = transcribe(client, {"url": "https://x"}, options, transcripts, "digest")
+    second = transcribe(client, {"url": "https://x"}, options, transcripts, "digest")
+    assert client.requests == 1
+    assert (first.cached, second.cached) == (False, True)
+    assert transcripts.stats()["misses"] == 1
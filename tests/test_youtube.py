@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from playground import youtube
+from playground.youtube import YouTubeIngest
+
+SLOW = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+FAST = "https://www.youtube.com/watch?v=bbbbbbbbbbb"
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Fake pytube, whose lookup of the slow video blocks until released"""
+    released = threading.Event()
+    calls = []
+
+    def lookup(url):
+        calls.append(url)
+        if url == SLOW:
+            released.wait(5)
+        stream = SimpleNamespace(subtype="webm", mime_type="audio/webm", url=url)
+        return SimpleNamespace(
+            streams=SimpleNamespace(filter=lambda **_: SimpleNamespace(first=lambda: stream))
+        )
+
+    monkeypatch.setattr(youtube, "YouTube", lookup)
+    monkeypatch.setattr(youtube.request, "stream", lambda url: iter([url.encode()]))
+    return released, calls
+
+
+def test_slow_lookup_does_not_block_other_sessions(lookups):
+    released, _ = lookups
+    ingest = YouTubeIngest()
+    slow = threading.Thread(target=ingest.acquire, args=(SLOW, "a"))
+    slow.start()
+    time.sleep(0.1)
+    started = time.monotonic()
+    download = ingest.acquire(FAST, "b")
+    assert time.monotonic() - started < 1
+    assert b"".join(download.iter_chunks()) == FAST.encode()
+    released.set()
+    slow.join()
+
+
+def test_sessions_share_a_download(lookups):
+    _, calls = lookups
+    ingest = YouTubeIngest()
+    first = ingest.acquire(FAST, "a")
+    assert ingest.acquire(FAST, "b") is first
+    assert calls == [FAST]
+    assert first.sessions == {"a", "b"}
+
+
+def test_idle_downloads_are_swept(lookups):
+    ingest = YouTubeIngest(grace=0.05, sweep_interval=0.05)
+    download = ingest.acquire(FAST, "a")
+    b"".join(download.iter_chunks())
+    ingest.acquire(FAST.replace("b", "c"), "a")  # the session moves on to another video
+    time.sleep(0.3)
+    assert not os.path.exists(download.path)